@@ -1,17 +1,20 @@
 # data_workers/market_data_provider.py (Versión con lógica de fecha robusta)
 
 import os
+import pandas as pd
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from quantex.core.series_catalog import get_series, get_many_series
+from quantex.core.resources import get_supabase
 
 # --- INICIALIZACIÓN DEL CLIENTE DE SUPABASE ---
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = get_supabase() # Mismo cliente que el catálogo y el servidor
+
+SNAPSHOT_WINDOW_DAYS = 21  # Ventana reciente que cubre el último dato, D-1 y W-1 (con feriados de por medio)
+SNAPSHOT_PAGE_SIZE = 1000  # Tamaño de página de PostgREST
 
 # --- FUNCIÓN PRINCIPAL DE RECOLECCIÓN DE DATOS ---
 
@@ -30,12 +33,12 @@ def get_comparative_data(series_name: str) -> dict:
     }
     
     try:
-        # 1. Obtener el ID de la serie
-        series_id_res = supabase.table('series_definitions').select('id').eq('series_name', series_name).single().execute()
-        if not series_id_res.data:
+        # 1. Obtener el ID de la serie (desde el catálogo en memoria, sin ir a Supabase)
+        series_info = get_series(series_name)
+        if not series_info:
             print(f"  -> No se encontró definición para la serie '{series_name}'.")
             return results
-        series_id = series_id_res.data['id']
+        series_id = series_info['id']
         print(f"  -> ID de la serie '{series_name}' encontrado.")
 
         # === LÓGICA MEJORADA DE 2 PASOS ===
@@ -79,6 +82,87 @@ def get_comparative_data(series_name: str) -> dict:
         print(f"  -> ❌ Error al obtener datos para '{series_name}': {e}")
         return results
 
+def _fetch_recent_window(series_ids: list, since: datetime) -> pd.DataFrame:
+    """Trae en una sola consulta (paginada) las filas recientes de todas las series pedidas."""
+    rows, page_start = [], 0
+    while True:
+        page = (supabase.table('time_series_data').select('series_id, timestamp, value')
+                .in_('series_id', series_ids).gte('timestamp', since.isoformat())
+                # series_id desempata los timestamps compartidos: sin él, las páginas pueden saltar o repetir filas.
+                .order('timestamp').order('series_id').range(page_start, page_start + SNAPSHOT_PAGE_SIZE - 1).execute())
+        rows.extend(page.data or [])
+        if not page.data or len(page.data) < SNAPSHOT_PAGE_SIZE: break
+        page_start += SNAPSHOT_PAGE_SIZE
+    df = pd.DataFrame(rows, columns=['series_id', 'timestamp', 'value'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    return df.dropna(subset=['value'])
+
+def _lookup_previous(latest: pd.DataFrame, history: pd.DataFrame, days_back: int) -> pd.Series:
+    """
+    Para cada serie, último valor dentro del día calendario que empieza `days_back` días
+    antes del día del último dato. Misma regla que `get_comparative_data`, pero vectorizada.
+    """
+    one_microsecond = pd.Timedelta(microseconds=1)
+    left = latest[['series_id', 'day_start']].copy()
+    # Buscamos hacia atrás desde el final del día objetivo y con tolerancia de un día exacto.
+    left['lookup_ts'] = left['day_start'] - pd.Timedelta(days=days_back - 1) - one_microsecond
+    left = left.sort_values('lookup_ts')
+    right = history[['series_id', 'timestamp', 'value']].sort_values('timestamp')
+    matched = pd.merge_asof(left, right, left_on='lookup_ts', right_on='timestamp', by='series_id',
+                            direction='backward', tolerance=pd.Timedelta(days=1) - one_microsecond)
+    return matched.set_index('series_id')['value']
+
+def get_comparative_snapshot(series_names: list[str], include_changes: bool = True, window_days: int = SNAPSHOT_WINDOW_DAYS) -> dict[str, dict]:
+    """
+    Versión por lotes de `get_comparative_data`: una sola consulta trae una ventana reciente
+    de todas las series y el último dato, D-1 y W-1 se calculan localmente con pandas.
+    Con `include_changes` añade las variaciones porcentuales D/D y W/W.
+    Las series sin datos dentro de la ventana devuelven valores None.
+    """
+    print(f"\n[DATA_WORKER] Buscando snapshot comparativo para {len(series_names)} series...")
+    empty_result = {"latest_date": None, "latest_value": None, "previous_day_value": None, "previous_week_value": None}
+    if include_changes:
+        empty_result.update({"day_change_pct": None, "week_change_pct": None})
+    results = {name: dict(empty_result) for name in series_names}
+
+    try:
+        definitions = get_many_series(series_names)
+        for name in series_names:
+            if name not in definitions: print(f"  -> No se encontró definición para la serie '{name}'.")
+        if not definitions: return results
+        ids_to_names = {definition['id']: name for name, definition in definitions.items()}
+
+        history = _fetch_recent_window(list(ids_to_names), datetime.now(timezone.utc) - timedelta(days=window_days))
+        if history.empty:
+            print("  -> No se encontraron datos recientes para las series solicitadas.")
+            return results
+
+        latest = history.loc[history.groupby('series_id')['timestamp'].idxmax()].copy()
+        latest['day_start'] = latest['timestamp'].dt.floor('D')
+        snapshot = latest.set_index('series_id')[['timestamp', 'value']].rename(columns={'value': 'latest_value'})
+        snapshot['previous_day_value'] = _lookup_previous(latest, history, days_back=1)
+        snapshot['previous_week_value'] = _lookup_previous(latest, history, days_back=7)
+        if include_changes:
+            snapshot['day_change_pct'] = (snapshot['latest_value'] / snapshot['previous_day_value'] - 1) * 100
+            snapshot['week_change_pct'] = (snapshot['latest_value'] / snapshot['previous_week_value'] - 1) * 100
+            # Un valor previo igual a cero daría infinito: lo tratamos como variación no disponible.
+            snapshot[['day_change_pct', 'week_change_pct']] = snapshot[['day_change_pct', 'week_change_pct']].replace([float('inf'), float('-inf')], float('nan'))
+        snapshot['latest_date'] = snapshot['timestamp'].dt.strftime('%Y-%m-%d')
+
+        value_columns = [column for column in empty_result if column != 'latest_date']
+        for series_id, row in snapshot.iterrows():
+            series_result = results[ids_to_names[series_id]]
+            series_result['latest_date'] = row['latest_date']
+            for column in value_columns:
+                series_result[column] = None if pd.isna(row[column]) else float(row[column])
+        print(f"  -> Snapshot calculado para {len(snapshot)} series con una sola consulta.")
+        return results
+
+    except Exception as e:
+        print(f"  -> ❌ Error al obtener el snapshot comparativo: {e}")
+        return results
+
 # --- BLOQUE DE PRUEBA INDEPENDIENTE ---
 if __name__ == "__main__":
     print("--- Probando el 'market_data_provider' (versión robusta) ---")
@@ -100,4 +184,9 @@ if __name__ == "__main__":
     if datos.get("previous_week_value") is not None:
         print(f"✅ Valor de la semana anterior: {datos['previous_week_value']}")
     else:
-        print(f"❌ No se encontró valor de la semana anterior.")
\ No newline at end of file
+        print(f"❌ No se encontró valor de la semana anterior.")
+
+    print("\n--- Snapshot comparativo por lotes ---")
+    snapshot = get_comparative_snapshot([serie_de_ejemplo, "COMEX", "SHFE"])
+    for nombre, valores in snapshot.items():
+        print(f"  {nombre}: {valores}")
\ No newline at end of file
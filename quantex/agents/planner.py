@@ -1,10 +1,11 @@
 # quantex/agents/planner.py
 
 import os
+import copy
 import json
-import time
 from dotenv import load_dotenv
-from anthropic import Anthropic
+from quantex.core.llm_gateway import create_message, create_message_async, CircuitOpenError
+from quantex.core.response_cache import get_response_cache
 
 # --- INICIALIZACIÓN Y RUTAS (CORREGIDO) ---
 
@@ -17,8 +18,9 @@ PROJECT_ROOT = os.path.dirname(agents_dir)
 dotenv_path = os.path.join(PROJECT_ROOT, '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-# Inicializamos el cliente de la API
-claude_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+PLANNER_MODEL = "claude-3-haiku-20240307"
+SEMANTIC_PLAN_CACHE = False  # True: reutiliza el plan de una consulta casi idéntica (carga el modelo de embeddings)
+plan_cache = get_response_cache('planner', semantic=SEMANTIC_PLAN_CACHE)
 
 
 def get_planner_prompt():
@@ -31,55 +33,88 @@ def get_planner_prompt():
         print(f"❌ Error cargando prompt del planificador: {e}")
         return "Error"
 
-def decide_tool_to_use(clean_query: str, max_retries: int = 3) -> dict | list:
-    """
-    Analiza la consulta y devuelve un plan de acción.
-    (El resto de esta función no necesita cambios)
-    """
+def parse_plan(json_text: str) -> dict | list:
+    """Extrae el primer objeto o lista JSON de la respuesta del LLM."""
+    start_bracket = json_text.find('[')
+    start_brace = json_text.find('{')
+
+    if start_bracket != -1 and (start_bracket < start_brace or start_brace == -1):
+        start_index = start_bracket
+        end_char = ']'
+    else:
+        start_index = start_brace
+        end_char = '}'
+
+    if start_index == -1:
+        raise ValueError("No se encontró JSON en la respuesta del LLM.")
+
+    end_index = json_text.rfind(end_char)
+    if end_index == -1:
+        raise ValueError("JSON malformado en la respuesta del LLM.")
+
+    json_str = json_text[start_index : end_index + 1]
+    return json.loads(json_str)
+
+def _prepare_plan(clean_query: str) -> tuple[str | None, dict | list | None]:
+    """Devuelve (prompt de sistema, resultado inmediato): el resultado es un plan cacheado o un error."""
     print(f"🧠 [Sub-Agente Planificador] Planificando para: '{clean_query}'")
     system_prompt = get_planner_prompt()
     if system_prompt == "Error":
-        return {"tool_name": "error", "argument": "No se pudo cargar el prompt del planificador."}
+        return None, {"tool_name": "error", "argument": "No se pudo cargar el prompt del planificador."}
+
+    cached_plan = plan_cache.get(system_prompt, PLANNER_MODEL, clean_query)
+    if cached_plan is not None:
+        print(f"   -> [Caché] Plan de Acción: {cached_plan}")
+        return system_prompt, copy.deepcopy(cached_plan) # El orquestador puede modificar el plan; la caché no
+    return system_prompt, None
+
+def _plan_request(system_prompt: str, clean_query: str) -> dict:
+    return dict(model=PLANNER_MODEL, max_tokens=2048, system=system_prompt, messages=[{"role": "user", "content": clean_query}])
+
+def _store_plan(system_prompt: str, clean_query: str, response) -> dict | list:
+    decision = parse_plan(response.content[0].text)
+    print(f"   -> Plan de Acción Generado: {decision}")
+    plan_cache.put(system_prompt, PLANNER_MODEL, clean_query, copy.deepcopy(decision))
+    return decision
+
+def _plan_error(attempt: int, max_retries: int, e: Exception) -> dict | None:
+    """Decide qué hacer con un error: None para reintentar (JSON inválido), o el plan de error a devolver."""
+    import anthropic # Ya importado por el gateway si hubo llamada; no se paga al importar el planificador
+    if isinstance(e, (anthropic.APIError, CircuitOpenError)):
+        print(f"   -> ❌ Error de la API en el Planificador: {e}")
+        return {"tool_name": "error", "argument": f"La API no respondió. Último error: {e}"}
+    print(f"   -> ❌ Error en el Planificador (Intento {attempt+1}/{max_retries}): {e}")
+    if attempt == max_retries - 1:
+        return {"tool_name": "error", "argument": f"Todos los reintentos fallaron. Último error: {e}"}
+    return None
+
+def decide_tool_to_use(clean_query: str, max_retries: int = 3) -> dict | list:
+    """
+    Analiza la consulta y devuelve un plan de acción. Los errores de la API ya vienen
+    reintentados por el gateway; aquí solo se reintenta si la respuesta no trae un JSON válido.
+    """
+    system_prompt, immediate = _prepare_plan(clean_query)
+    if immediate is not None: return immediate
 
     for attempt in range(max_retries):
         try:
-            response = claude_client.messages.create(
-                model="claude-3-haiku-20240307", 
-                max_tokens=2048,
-                system=system_prompt,
-                messages=[{"role": "user", "content": clean_query}]
-            )
-            
-            json_text = response.content[0].text
-
-            start_bracket = json_text.find('[')
-            start_brace = json_text.find('{')
-            
-            if start_bracket != -1 and (start_bracket < start_brace or start_brace == -1):
-                start_index = start_bracket
-                end_char = ']'
-            else:
-                start_index = start_brace
-                end_char = '}'
-            
-            if start_index == -1:
-                raise ValueError("No se encontró JSON en la respuesta del LLM.")
-
-            end_index = json_text.rfind(end_char)
-            if end_index == -1:
-                raise ValueError("JSON malformado en la respuesta del LLM.")
-
-            json_str = json_text[start_index : end_index + 1]
-            decision = json.loads(json_str)
-
-            print(f"   -> Plan de Acción Generado: {decision}")
-            return decision
+            return _store_plan(system_prompt, clean_query, create_message('planner', **_plan_request(system_prompt, clean_query)))
+        except Exception as e:
+            error_plan = _plan_error(attempt, max_retries, e)
+            if error_plan is not None: return error_plan
 
+    return {"tool_name": "error", "argument": "Fallo inesperado en el planificador."}
+
+async def decide_tool_to_use_async(clean_query: str, max_retries: int = 3) -> dict | list:
+    """Versión async de `decide_tool_to_use` para el servidor async."""
+    system_prompt, immediate = _prepare_plan(clean_query)
+    if immediate is not None: return immediate
+
+    for attempt in range(max_retries):
+        try:
+            return _store_plan(system_prompt, clean_query, await create_message_async('planner', **_plan_request(system_prompt, clean_query)))
         except Exception as e:
-            print(f"   -> ❌ Error en el Planificador (Intento {attempt+1}/{max_retries}): {e}")
-            if attempt < max_retries - 1: 
-                time.sleep(2**attempt)
-            else:
-                return {"tool_name": "error", "argument": f"Todos los reintentos fallaron. Último error: {e}"}
-    
-    return {"tool_name": "error", "argument": "Fallo inesperado en el planificador."}
\ No newline at end of file
+            error_plan = _plan_error(attempt, max_retries, e)
+            if error_plan is not None: return error_plan
+
+    return {"tool_name": "error", "argument": "Fallo inesperado en el planificador."}
@@ -1,9 +1,9 @@
 # quantex/agents/reformulator.py
 
 import os
-import time
 from dotenv import load_dotenv
-import anthropic
+from quantex.core.llm_gateway import create_message, create_message_async
+from quantex.core.response_cache import get_response_cache
 
 # --- INICIALIZACIÓN Y RUTAS (CORREGIDO) ---
 
@@ -16,12 +16,9 @@ PROJECT_ROOT = os.path.dirname(agents_dir)
 dotenv_path = os.path.join(PROJECT_ROOT, '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-# Inicializamos el cliente de la API
-try:
-    claude_client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-except Exception as e:
-    print(f"❌ [Query Reformulator] Error al inicializar cliente de Anthropic: {e}")
-    claude_client = None
+REFORMULATOR_MODEL = "claude-3-haiku-20240307"
+# Solo coincidencia exacta: dos preguntas parecidas pueden pedir fechas o series distintas.
+reformulation_cache = get_response_cache('reformulator')
 
 
 def get_reformulator_prompt():
@@ -35,42 +32,54 @@ def get_reformulator_prompt():
         print(f"❌ ERROR: No se pudo cargar 'prompt_reformulator.txt': {e}")
         return None
 
-def reformulate_query(user_query: str, max_retries: int = 3) -> str:
+def _prepare_reformulation(user_query: str) -> tuple[str | None, str | None]:
+    """Devuelve (prompt de sistema, respuesta cacheada). Sin prompt, el llamador devuelve la query original."""
+    print(f"🧠 [Sub-Agente Reformulador] Analizando: '{user_query}'")
+
+    system_prompt = get_reformulator_prompt()
+    if not system_prompt:
+        print("-> [Query Reformulator] No se pudo cargar el prompt. Devolviendo query original.")
+        return None, None
+
+    cached = reformulation_cache.get(system_prompt, REFORMULATOR_MODEL, user_query)
+    if cached is not None:
+        print(f"   -> [Caché] Consulta Limpia: '{cached}'")
+    return system_prompt, cached
+
+def _reformulation_request(system_prompt: str, user_query: str) -> dict:
+    return dict(model=REFORMULATOR_MODEL, max_tokens=200, system=system_prompt, messages=[{"role": "user", "content": user_query}])
+
+def _store_reformulation(system_prompt: str, user_query: str, response) -> str:
+    reformulated_query = response.content[0].text.strip()
+    print(f"   -> Consulta Limpia: '{reformulated_query}'")
+    reformulation_cache.put(system_prompt, REFORMULATOR_MODEL, user_query, reformulated_query)
+    return reformulated_query
+
+def reformulate_query(user_query: str) -> str:
     """
     Toma una pregunta de usuario y la reformula para que sea clara y precisa.
-    (El resto de esta función no necesita cambios)
+    Los reintentos y límites de la API los maneja el gateway compartido.
     """
-    if not claude_client:
-        print("-> [Query Reformulator] Cliente de Anthropic no disponible. Devolviendo query original.")
-        return user_query
+    system_prompt, cached = _prepare_reformulation(user_query)
+    if not system_prompt: return user_query
+    if cached is not None: return cached
 
-    print(f"🧠 [Sub-Agente Reformulador] Analizando: '{user_query}'")
-    
-    system_prompt = get_reformulator_prompt()
-    if not system_prompt: 
-        print("-> [Query Reformulator] No se pudo cargar el prompt. Devolviendo query original.")
+    try:
+        response = create_message('reformulator', **_reformulation_request(system_prompt, user_query))
+        return _store_reformulation(system_prompt, user_query, response)
+    except Exception as e:
+        print(f"   -> ❌ Error final en el Reformulador: {e}. Devolviendo query original.")
         return user_query
 
-    for attempt in range(max_retries):
-        try:
-            response = claude_client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=200,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_query}]
-            )
-            reformulated_query = response.content[0].text.strip()
-            print(f"   -> Consulta Limpia: '{reformulated_query}'")
-            return reformulated_query
-        except anthropic.APIStatusError as e:
-            if e.status_code == 529 and attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                print(f"   -> ⚠️ API sobrecargada. Reintentando en {wait_time} segundo(s)...")
-                time.sleep(wait_time)
-            else:
-                print(f"   -> ❌ Error final en el Reformulador (API): {e}")
-                return user_query
-        except Exception as e:
-            print(f"   -> ❌ Error general en el Reformulador: {e}")
-            return user_query
-    return user_query
\ No newline at end of file
+async def reformulate_query_async(user_query: str) -> str:
+    """Versión async de `reformulate_query` para el servidor async."""
+    system_prompt, cached = _prepare_reformulation(user_query)
+    if not system_prompt: return user_query
+    if cached is not None: return cached
+
+    try:
+        response = await create_message_async('reformulator', **_reformulation_request(system_prompt, user_query))
+        return _store_reformulation(system_prompt, user_query, response)
+    except Exception as e:
+        print(f"   -> ❌ Error final en el Reformulador: {e}. Devolviendo query original.")
+        return user_query
@@ -0,0 +1,141 @@
+# quantex/api/async_server.py
+# Modo de servicio async del orquestador (aiohttp). Expone las mismas rutas que server.py, pero
+# las llamadas a Claude (reformulación, plan y síntesis) no ocupan un hilo mientras esperan:
+# un solo proceso atiende muchos /chat simultáneos.
+#
+# Uso:  python quantex/api/async_server.py --port 5001
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from aiohttp import web
+
+# Añadimos la raíz del proyecto al path de Python para que las importaciones funcionen.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(project_root)
+
+from quantex.api import server
+from quantex.agents.reformulator import reformulate_query_async
+from quantex.agents.planner import decide_tool_to_use_async
+from quantex.core.llm_gateway import create_message_async, stream_text_async, get_llm_gateway
+from quantex.core.response_cache import get_all_cache_metrics
+from quantex.core.resources import registry
+
+# --- CONFIGURACIÓN ---
+DEFAULT_PORT = 5001
+# Supabase y las herramientas siguen siendo síncronas: corren en hilos sin bloquear el event loop.
+BLOCKING_THREADS = 32
+# ---------------------
+
+INDEX_PATH = os.path.join(current_dir, 'templates', 'index.html')
+
+
+async def prepare_synthesis_async(user_message: str, context_id=None, on_progress=None) -> dict:
+    """Igual que `server.prepare_synthesis`, con las llamadas a Claude en modo async."""
+    on_progress = on_progress or (lambda phase, detail: None)
+    if context_id: return await asyncio.to_thread(server.prepare_edit_synthesis, user_message, context_id)
+
+    print("   -> [Orquestador async] Iniciando flujo de creación...")
+    clean_query = await reformulate_query_async(user_message)
+    await on_progress('reformulate', clean_query)
+    action_plan = await decide_tool_to_use_async(clean_query)
+    await on_progress('plan', action_plan)
+
+    action_list = action_plan if isinstance(action_plan, list) else [action_plan]
+    evidence_dossier = await asyncio.to_thread(server.collect_evidence, action_list)
+    await on_progress('tools', f"{len(evidence_dossier)} resultado(s) de herramientas")
+    return await asyncio.to_thread(server.build_creation_synthesis, user_message, evidence_dossier)
+
+async def _read_chat_request(request: web.Request) -> tuple[str | None, str | None]:
+    json_data = await request.json()
+    return json_data.get("message"), json_data.get("context_id")
+
+async def home(request: web.Request) -> web.Response:
+    return web.FileResponse(INDEX_PATH)
+
+async def llm_metrics(request: web.Request) -> web.Response:
+    embeddings = registry.get('embedding_service').get_metrics() if registry.is_loaded('embedding_service') else None
+    return web.json_response(dict(get_llm_gateway().get_metrics(), response_cache=get_all_cache_metrics(), resources=registry.status(), embeddings=embeddings))
+
+async def chat(request: web.Request) -> web.Response:
+    user_message, context_id = await _read_chat_request(request)
+    if not user_message: return web.json_response({"error": "No se recibió ningún mensaje."})
+
+    print(f"💬 [Orquestador async] Petición recibida: '{user_message}'")
+    if context_id: print(f"   -> En el contexto del artefacto: {context_id}")
+
+    async def ignore_progress(phase, detail): pass
+
+    try:
+        try:
+            synthesis = await prepare_synthesis_async(user_message, context_id, ignore_progress)
+        except LookupError as e:
+            return web.json_response({"text_response": str(e)})
+
+        response = await create_message_async('synthesis', model=server.SYNTHESIS_MODEL, max_tokens=server.SYNTHESIS_MAX_TOKENS,
+                                              system=synthesis['system'], messages=[{"role": "user", "content": synthesis['prompt']}])
+        body = await asyncio.to_thread(server.finalize_response, user_message, context_id, synthesis, response.content[0].text)
+        return web.json_response(body)
+    except Exception as e:
+        print(f"❌ Ocurrió un error en el Orquestador async: {e}")
+        return web.json_response({"text_response": "Lo siento, ocurrió un error grave."})
+
+async def chat_stream(request: web.Request) -> web.StreamResponse:
+    """Mismos eventos SSE que /chat/stream de server.py ('progress', 'token', 'done', 'error')."""
+    user_message, context_id = await _read_chat_request(request)
+    if not user_message: return web.json_response({"error": "No se recibió ningún mensaje."})
+
+    print(f"💬 [Orquestador async] Petición recibida (streaming): '{user_message}'")
+    if context_id: print(f"   -> En el contexto del artefacto: {context_id}")
+
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    await response.prepare(request)
+
+    async def send(event: str, data):
+        await response.write(server.sse_event(event, data).encode('utf-8'))
+
+    await send('progress', {'phase': 'start', 'detail': 'Petición recibida'})
+    try:
+        try:
+            synthesis = await prepare_synthesis_async(user_message, context_id, lambda phase, detail: send('progress', {'phase': phase, 'detail': detail}))
+        except LookupError as e:
+            await send('done', {"text_response": str(e)})
+            return response
+
+        await send('progress', {'phase': 'synthesis', 'detail': 'Generando respuesta'})
+        chunks = []
+        async for text in stream_text_async('synthesis', model=server.SYNTHESIS_MODEL, max_tokens=server.SYNTHESIS_MAX_TOKENS,
+                                            system=synthesis['system'], messages=[{"role": "user", "content": synthesis['prompt']}]):
+            chunks.append(text)
+            await send('token', {'text': text})
+        # El artefacto se guarda solo con la respuesta completa.
+        await send('done', await asyncio.to_thread(server.finalize_response, user_message, context_id, synthesis, ''.join(chunks)))
+    except ConnectionResetError:
+        print("   -> ⚠️ El cliente cerró la conexión durante el streaming.")
+    except Exception as e:
+        print(f"❌ Ocurrió un error en el Orquestador async (streaming): {e}")
+        await send('error', {"text_response": "Lo siento, ocurrió un error grave."})
+    return response
+
+async def _configure_thread_pool(app: web.Application):
+    from concurrent.futures import ThreadPoolExecutor
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=BLOCKING_THREADS, thread_name_prefix='quantex-blocking'))
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.on_startup.append(_configure_thread_pool)
+    app.router.add_get('/', home)
+    app.router.add_get('/llm_metrics', llm_metrics)
+    app.router.add_post('/chat', chat)
+    app.router.add_post('/chat/stream', chat_stream)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor async del orquestador Quantex.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
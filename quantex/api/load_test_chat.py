@@ -0,0 +1,159 @@
+# quantex/api/load_test_chat.py
+# Prueba de carga de /chat: cuántos chats simultáneos sostiene un proceso.
+#
+# Contra un servidor ya levantado (usa la API real: consume tokens):
+#   python quantex/api/load_test_chat.py --url http://127.0.0.1:5001/chat --levels 1,4,16
+#
+# Comparación local, servidor síncrono (Flask) vs. async (aiohttp), con Claude simulado
+# (cada llamada tarda --simulate segundos, sin red ni tokens):
+#   python quantex/api/load_test_chat.py --simulate 1.5 --levels 1,8,32,64
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from types import SimpleNamespace
+import aiohttp
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(project_root)
+
+# --- CONFIGURACIÓN ---
+DEFAULT_LEVELS = '1,8,32,64'
+REQUEST_TIMEOUT_SECONDS = 300
+SYNC_WORKER_THREADS = 8  # Hilos del servidor síncrono simulado (como un gunicorn/waitress típico)
+# ---------------------
+
+
+async def _one_chat(session: aiohttp.ClientSession, url: str, level: int, index: int) -> tuple[bool, float]:
+    # Cada mensaje es único para que la caché de sub-agentes no distorsione la medición.
+    payload = {'message': f"prueba de carga {level}-{index} {uuid.uuid4().hex[:8]}"}
+    started_at = time.perf_counter()
+    try:
+        async with session.post(url, json=payload) as response:
+            body = await response.json(content_type=None)
+            ok = response.status == 200 and 'grave' not in str(body.get('text_response', ''))
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - started_at
+
+async def run_level(url: str, concurrency: int, total_requests: int) -> dict:
+    """Lanza `total_requests` chats con `concurrency` en vuelo a la vez y resume latencias y throughput."""
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+        async def bounded(index):
+            async with semaphore:
+                return await _one_chat(session, url, concurrency, index)
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(total_requests)))
+        elapsed = time.perf_counter() - started_at
+    latencies = sorted(latency for ok, latency in results if ok)
+    percentile = lambda p: round(latencies[int(p * (len(latencies) - 1))], 2) if latencies else None
+    return {'concurrency': concurrency, 'requests': total_requests, 'ok': len(latencies), 'errors': total_requests - len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2), 'p50_s': percentile(0.5), 'p95_s': percentile(0.95)}
+
+def print_table(title: str, rows: list[dict]):
+    print(f"\n=== {title} ===")
+    print(f"{'concurrencia':>12} {'ok':>5} {'errores':>8} {'chats/s':>8} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for row in rows:
+        print(f"{row['concurrency']:>12} {row['ok']:>5} {row['errors']:>8} {row['throughput_rps']:>8} {str(row['p50_s']):>8} {str(row['p95_s']):>8}")
+
+async def sweep(url: str, levels: list[int], requests_per_level: int | None) -> list[dict]:
+    rows = []
+    for level in levels:
+        rows.append(await run_level(url, level, requests_per_level or level * 2))
+    return rows
+
+
+# --- MODO SIMULADO: ambos servidores en este proceso, con Claude reemplazado por una espera fija ---
+
+def install_simulated_llm(latency_seconds: float):
+    """
+    Gateway sin límites de tasa cuyo cliente responde tras `latency_seconds` con un plan vacío
+    (sin herramientas) seguido de un texto único, para que la caché del planificador no acierte.
+    """
+    from quantex.core import llm_gateway
+
+    def fake_response():
+        return SimpleNamespace(content=[SimpleNamespace(text=f'[] {uuid.uuid4().hex}')], usage=SimpleNamespace(input_tokens=0, output_tokens=0))
+
+    def create(**kwargs):
+        time.sleep(latency_seconds)
+        return fake_response()
+
+    async def create_async(**kwargs):
+        await asyncio.sleep(latency_seconds)
+        return fake_response()
+
+    gateway = llm_gateway.LLMGateway(requests_per_minute=1e9, tokens_per_minute=1e12)
+    gateway._client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    gateway._async_client = SimpleNamespace(messages=SimpleNamespace(create=create_async))
+    llm_gateway._gateway = gateway
+
+def start_sync_server(port: int, worker_threads: int):
+    """Flask detrás de werkzeug, limitado a `worker_threads` peticiones simultáneas como un servidor de hilos fijos."""
+    from werkzeug.serving import make_server
+    from quantex.api.server import app
+    slots = threading.BoundedSemaphore(worker_threads)
+
+    def limited_app(environ, start_response):
+        with slots:
+            return list(app(environ, start_response))
+
+    http_server = make_server('127.0.0.1', port, limited_app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    return http_server
+
+def start_async_server(port: int):
+    from aiohttp import web
+    from quantex.api.async_server import create_app
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def serve():
+        runner = web.AppRunner(create_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        ready.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop
+
+def run_simulated_comparison(latency_seconds: float, levels: list[int], requests_per_level: int | None, sync_threads: int):
+    install_simulated_llm(latency_seconds)
+    start_sync_server(5911, sync_threads)
+    start_async_server(5912)
+    print(f"Claude simulado: {latency_seconds}s por llamada (3 llamadas por chat: reformular, planificar, sintetizar).")
+    sync_rows = asyncio.run(sweep('http://127.0.0.1:5911/chat', levels, requests_per_level))
+    async_rows = asyncio.run(sweep('http://127.0.0.1:5912/chat', levels, requests_per_level))
+    print_table(f"Síncrono (Flask, {sync_threads} hilos)", sync_rows)
+    print_table("Async (aiohttp, un proceso)", async_rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de /chat.")
+    parser.add_argument('--url', help="URL de /chat de un servidor ya levantado.")
+    parser.add_argument('--simulate', type=float, metavar='SEGUNDOS', help="Compara ambos servidores en este proceso con Claude simulado.")
+    parser.add_argument('--levels', default=DEFAULT_LEVELS, help="Niveles de concurrencia separados por coma.")
+    parser.add_argument('--requests', type=int, help="Peticiones por nivel (por defecto, el doble de la concurrencia).")
+    parser.add_argument('--sync-threads', type=int, default=SYNC_WORKER_THREADS, help="Hilos del servidor síncrono en modo simulado.")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+
+    if args.simulate is not None:
+        run_simulated_comparison(args.simulate, levels, args.requests, args.sync_threads)
+    elif args.url:
+        print_table(args.url, asyncio.run(sweep(args.url, levels, args.requests)))
+    else:
+        parser.error("Indica --url o --simulate.")
@@ -4,8 +4,10 @@
 import os
 import sys
 import json
-from flask import Flask, render_template, request, jsonify
-import anthropic
+import queue
+import threading
+from functools import partial
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 import pytz
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
@@ -28,6 +30,13 @@ except ImportError as e:
     def reformulate_query(query): return query
     def decide_tool_to_use(query): return {"tool_name": "error", "argument": "Módulos no encontrados."}
 
+from quantex.api.tool_executor import run_tool_tasks
+from quantex.core.llm_gateway import create_message, stream_text, get_llm_gateway
+from quantex.core.response_cache import get_all_cache_metrics
+from quantex.core.resources import get_supabase, preload, registry
+from quantex.core.series_catalog import get_series, get_many_series
+from quantex.core.timeseries_store import get_timeseries_store
+
 # --- CONFIGURACIÓN E INICIALIZACIÓN ---
 load_dotenv(dotenv_path=os.path.join(project_root, '.env'))
 app = Flask(__name__, template_folder='templates') # Indicamos a Flask dónde están las plantillas
@@ -35,14 +44,20 @@ app.config['TEMPLATES_AUTO_RELOAD'] = True
 CHILE_TZ = pytz.timezone('America/Santiago')
 
 try:
-    from supabase import create_client, Client
-    claude_client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-    supabase: Client = create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY"))
+    supabase = get_supabase() # Compartido con el catálogo y los proveedores de datos
     print("✅ Clientes de API inicializados.")
 except Exception as e:
     print(f"❌ Error al inicializar clientes: {e}")
 
+# Recursos a construir al arrancar en vez de en la primera petición, p. ej. QUANTEX_PRELOAD=embedding_model,llm_gateway
+PRELOAD_RESOURCES = [name.strip() for name in os.environ.get("QUANTEX_PRELOAD", "").split(',') if name.strip()]
+if PRELOAD_RESOURCES: preload(PRELOAD_RESOURCES)
+
 # --- DEFINICIÓN DE HERRAMIENTAS ---
+MAX_ROWS_PER_SERIES = 365  # Observaciones máximas por serie que se entregan al sintetizador
+BULK_DEFAULT_LOOKBACK_DAYS = 550  # ~365 días hábiles cuando el plan no pide un período
+BULK_PAGE_SIZE = 1000  # Tamaño de página de PostgREST para la consulta por lotes
+
 def get_news_articles(topic: str = None, date_filter: str = None, days_ago: int = None) -> str:
     print(f"🛠️ [Herramienta Noticias] Ejecutando para Tema: '{topic}', Filtro Fecha: '{date_filter}', Días Atrás: {days_ago}")
     try:
@@ -68,12 +83,36 @@ def get_news_articles(topic: str = None, date_filter: str = None, days_ago: int
         return "\n".join([f"- ({datetime.strptime(a['published_at'], '%Y-%m-%d').strftime('%d-%m-%Y')}) **{a['title']}**: {a['summary']}" for a in response.data])
     except Exception as e: return f"Error técnico al buscar noticias: {e}"
 
+def format_market_data_block(series_name: str, series_unit: str, rows: list[dict]) -> str:
+    """Da formato de texto (más reciente primero) a las filas de una serie para el dossier."""
+    header = f"Datos para la serie '{series_name}':\n"
+    return header + "\n".join([f"- {datetime.fromisoformat(row['timestamp']).strftime('%d-%m-%Y')}: {row['value']} {series_unit}".strip() for row in rows])
+
+def read_local_market_rows(series_id, date_filter: str = None, days_ago: int = None) -> list[dict] | None:
+    """Lee la serie desde el almacén local. Devuelve None si no está sincronizada (se consulta Supabase)."""
+    start_date, end_date = None, None
+    if days_ago:
+        try:
+            num_days = int(days_ago)
+            if num_days > 0:
+                end_date = datetime.now(CHILE_TZ)
+                start_date = end_date - timedelta(days=num_days)
+        except (ValueError, TypeError): pass
+    elif date_filter:
+        start_date = datetime.strptime(date_filter, '%Y-%m-%d')
+        end_date = start_date + timedelta(days=1, seconds=-1)
+    return get_timeseries_store().read_rows(series_id, start_date, end_date, limit=MAX_ROWS_PER_SERIES)
+
 def get_market_data(series_name: str, date_filter: str = None, days_ago: int = None) -> str:
     print(f"🛠️ [Herramienta Mercado] Ejecutando para Serie: '{series_name}', Filtro Fecha: '{date_filter}', Días Atrás: {days_ago}")
     try:
-        series_info_res = supabase.table('series_definitions').select('id, unit').eq('series_name', series_name).single().execute()
-        if not series_info_res.data: return f"Error: La serie '{series_name}' no fue encontrada."
-        series_id, series_unit = series_info_res.data['id'], series_info_res.data.get('unit', '')
+        series_info = get_series(series_name)
+        if not series_info: return f"Error: La serie '{series_name}' no fue encontrada."
+        series_id, series_unit = series_info['id'], series_info.get('unit', '')
+        local_rows = read_local_market_rows(series_id, date_filter, days_ago)
+        if local_rows is not None:
+            if not local_rows: return f"No se encontraron datos para la serie '{series_name}' en el período solicitado."
+            return format_market_data_block(series_name, series_unit, local_rows)
         query = supabase.table('time_series_data').select('timestamp, value').eq('series_id', series_id)
         if days_ago:
             try:
@@ -87,45 +126,163 @@ def get_market_data(series_name: str, date_filter: str = None, days_ago: int = N
             start_of_day = datetime.strptime(date_filter, '%Y-%m-%d').isoformat()
             end_of_day = (datetime.strptime(date_filter, '%Y-%m-%d') + timedelta(days=1, seconds=-1)).isoformat()
             query = query.gte('timestamp', start_of_day).lte('timestamp', end_of_day)
-        response = query.order('timestamp', desc=True).limit(365).execute()
+        response = query.order('timestamp', desc=True).limit(MAX_ROWS_PER_SERIES).execute()
         if not response.data: return f"No se encontraron datos para la serie '{series_name}' en el período solicitado."
-        header = f"Datos para la serie '{series_name}':\n"
-        return header + "\n".join([f"- {datetime.fromisoformat(row['timestamp']).strftime('%d-%m-%Y')}: {row['value']} {series_unit}".strip() for row in response.data])
+        return format_market_data_block(series_name, series_unit, response.data)
     except Exception as e: return f"Error técnico al buscar datos de mercado para '{series_name}': {e}"
 
+def _fetch_all_pages(build_query) -> list[dict]:
+    """PostgREST limita las filas por respuesta: repite la consulta (que debe tener un orden total) página a página."""
+    rows, page_start = [], 0
+    while True:
+        page = build_query().range(page_start, page_start + BULK_PAGE_SIZE - 1).execute()
+        rows.extend(page.data or [])
+        if not page.data or len(page.data) < BULK_PAGE_SIZE: return rows
+        page_start += BULK_PAGE_SIZE
+
+def get_market_data_bulk(series_names: list[str], date_filter: str = None, days_ago: int = None) -> dict[str, str]:
+    """
+    Variante por lotes de `get_market_data`: resuelve todos los IDs desde el catálogo en memoria
+    y trae las filas de todas las series en una sola consulta por ventana de fechas.
+    Devuelve {series_name: bloque_formateado}, con el mismo texto que la versión individual.
+    """
+    print(f"🛠️ [Herramienta Mercado (Lote)] Ejecutando para Series: {series_names}, Filtro Fecha: '{date_filter}', Días Atrás: {days_ago}")
+    try:
+        definitions = get_many_series(series_names)
+        blocks = {name: f"Error: La serie '{name}' no fue encontrada." for name in series_names if name not in definitions}
+        if not definitions: return blocks
+
+        # Primero el almacén local; solo las series que no estén sincronizadas van a Supabase.
+        ids_to_names = {}
+        for series_name, definition in definitions.items():
+            local_rows = read_local_market_rows(definition['id'], date_filter, days_ago)
+            if local_rows is None: ids_to_names[definition['id']] = series_name
+            elif not local_rows: blocks[series_name] = f"No se encontraron datos para la serie '{series_name}' en el período solicitado."
+            else: blocks[series_name] = format_market_data_block(series_name, definition.get('unit', ''), local_rows)
+        if not ids_to_names: return blocks
+
+        # Sin filtro explícito acotamos la ventana para no descargar la historia completa:
+        # alcanza para las últimas MAX_ROWS_PER_SERIES observaciones diarias (días hábiles).
+        end_date = datetime.now(CHILE_TZ)
+        start_date = end_date - timedelta(days=BULK_DEFAULT_LOOKBACK_DAYS)
+        default_window = True
+        if days_ago:
+            try:
+                num_days = int(days_ago)
+                if num_days > 0: start_date, default_window = end_date - timedelta(days=num_days), False
+            except (ValueError, TypeError): print(f"  -> ⚠️ 'days_ago' no es un entero válido: {days_ago}")
+        elif date_filter:
+            start_date = datetime.strptime(date_filter, '%Y-%m-%d')
+            end_date = start_date + timedelta(days=1, seconds=-1)
+            default_window = False
+
+        rows_by_id = {series_id: [] for series_id in ids_to_names}
+        # Varias series comparten timestamps: series_id desempata para que las páginas sean deterministas.
+        window_query = lambda: (supabase.table('time_series_data').select('series_id, timestamp, value')
+                                .in_('series_id', list(ids_to_names))
+                                .gte('timestamp', start_date.isoformat()).lte('timestamp', end_date.isoformat())
+                                .order('timestamp', desc=True).order('series_id'))
+        for row in _fetch_all_pages(window_query):
+            rows_by_id[row['series_id']].append(row)
+
+        if default_window:
+            # Igual que get_market_data: sin período pedido se entregan las últimas MAX_ROWS_PER_SERIES
+            # observaciones de cualquier antigüedad. Las series poco densas (semanales, mensuales) no las
+            # completan en la ventana: una sola consulta trae su historia anterior y se recorta aquí.
+            short_ids = [series_id for series_id, rows in rows_by_id.items() if len(rows) < MAX_ROWS_PER_SERIES]
+            if short_ids:
+                history_query = lambda: (supabase.table('time_series_data').select('series_id, timestamp, value')
+                                         .in_('series_id', short_ids).lt('timestamp', start_date.isoformat())
+                                         .order('series_id').order('timestamp', desc=True))
+                for row in _fetch_all_pages(history_query):
+                    series_rows = rows_by_id[row['series_id']]
+                    if len(series_rows) < MAX_ROWS_PER_SERIES: series_rows.append(row)
+
+        for series_id, series_name in ids_to_names.items():
+            rows = rows_by_id[series_id][:MAX_ROWS_PER_SERIES]
+            if not rows:
+                blocks[series_name] = f"No se encontraron datos para la serie '{series_name}' en el período solicitado."
+            else:
+                blocks[series_name] = format_market_data_block(series_name, definitions[series_name].get('unit', ''), rows)
+        return blocks
+    except Exception as e:
+        return {name: f"Error técnico al buscar datos de mercado para '{name}': {e}" for name in series_names}
+
 TOOL_MAPPING = { "get_news_articles": get_news_articles, "get_market_data": get_market_data, }
 
+def build_tool_tasks(action_list: list) -> tuple[list, list]:
+    """
+    Traduce el plan de acción a sub-tareas ejecutables. Varias llamadas a `get_market_data`
+    con el mismo período se agrupan en una sola tarea `get_market_data_bulk`.
+    Devuelve (sub_tasks, plan_slots): cada slot apunta a (índice de tarea, serie o None),
+    en el orden original del plan.
+    """
+    sub_tasks, plan_slots, market_groups = [], [], {}
+    for action in action_list:
+        if action and action.get('tool_name') in TOOL_MAPPING:
+            tool_name, argument, date_filter, days_ago = action.get('tool_name'), action.get('argument'), action.get('date_filter'), action.get('days_ago')
+            print(f"   -> [Orquestador] Programando sub-tarea: {tool_name}('{argument}')...")
+            tool_to_run = TOOL_MAPPING[tool_name]
+            if tool_name == "get_market_data":
+                market_groups.setdefault((date_filter, days_ago), []).append((len(plan_slots), argument))
+                plan_slots.append(None) # Se completa al agrupar las series
+                continue
+            if tool_name == "get_news_articles": task = partial(tool_to_run, topic=argument, date_filter=date_filter, days_ago=days_ago)
+            else: task = lambda: "Herramienta desconocida."
+            plan_slots.append((len(sub_tasks), None))
+            sub_tasks.append((tool_name, task))
+
+    for (date_filter, days_ago), entries in market_groups.items():
+        if len(entries) == 1:
+            slot, series_name = entries[0]
+            plan_slots[slot] = (len(sub_tasks), None)
+            sub_tasks.append(("get_market_data", partial(get_market_data, series_name=series_name, date_filter=date_filter, days_ago=days_ago)))
+        else:
+            print(f"   -> [Orquestador] Agrupando {len(entries)} series en una sola consulta por lotes.")
+            task_index = len(sub_tasks)
+            sub_tasks.append(("get_market_data", partial(get_market_data_bulk, series_names=[name for _, name in entries], date_filter=date_filter, days_ago=days_ago)))
+            for slot, series_name in entries: plan_slots[slot] = (task_index, series_name)
+    return sub_tasks, plan_slots
+
+def collect_evidence(action_list: list) -> list[str]:
+    """Ejecuta el plan en paralelo y arma el dossier de evidencia en el orden del plan."""
+    sub_tasks, plan_slots = build_tool_tasks(action_list)
+    results = run_tool_tasks(sub_tasks)
+    evidence_dossier = []
+    for task_index, series_name in plan_slots:
+        result = results[task_index]
+        # Un resultado por lotes es un dict por serie; si la tarea falló entera llega como texto.
+        if series_name is not None and isinstance(result, dict):
+            result = result.get(series_name, f"Error: La serie '{series_name}' no fue encontrada.")
+        evidence_dossier.append(result)
+    return evidence_dossier
+
 @app.route("/")
 def home():
     return render_template("index.html")
 
-@app.route("/chat", methods=['POST'])
-def chat():
-    json_data = request.get_json()
-    user_message = json_data.get("message")
-    context_id = json_data.get("context_id")
-    if not user_message: return jsonify({"error": "No se recibió ningún mensaje."})
-    
-    print(f"💬 [Orquestador] Petición recibida: '{user_message}'")
-    if context_id: print(f"   -> En el contexto del artefacto: {context_id}")
+@app.route("/llm_metrics")
+def llm_metrics():
+    """Estado del circuito, métricas por llamador del gateway de Anthropic y aciertos de la caché de sub-agentes."""
+    embeddings = registry.get('embedding_service').get_metrics() if registry.is_loaded('embedding_service') else None
+    return jsonify(dict(get_llm_gateway().get_metrics(), response_cache=get_all_cache_metrics(), resources=registry.status(), embeddings=embeddings))
 
-    try:
-        synthesis_system_prompt = ""
-        source_data_for_saving = ""
-        prev_artifact = None
+SYNTHESIS_MODEL = "claude-3-5-sonnet-20240620"
+SYNTHESIS_MAX_TOKENS = 4096
 
-        if context_id:
-            print("   -> [Orquestador] Iniciando flujo de edición...")
-            artifact_res = supabase.table('generated_artifacts').select('*').eq('id', context_id).single().execute()
-            if not artifact_res.data: return jsonify({"text_response": "Error: No se encontró el artefacto original para editar."})
-            
-            prev_artifact = artifact_res.data
-            prompt_file_name = f"prompt_{prev_artifact['artifact_type']}.txt"
-            prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                synthesis_system_prompt = f.read()
-
-            final_prompt_for_llm = f"""DATOS ORIGINALES (NO CAMBIAN):
+def prepare_edit_synthesis(user_message: str, context_id) -> dict:
+    """Flujo de edición: carga el artefacto previo y arma el prompt. Lanza LookupError si no existe."""
+    print("   -> [Orquestador] Iniciando flujo de edición...")
+    artifact_res = supabase.table('generated_artifacts').select('*').eq('id', context_id).single().execute()
+    if not artifact_res.data: raise LookupError("Error: No se encontró el artefacto original para editar.")
+
+    prev_artifact = artifact_res.data
+    prompt_file_name = f"prompt_{prev_artifact['artifact_type']}.txt"
+    prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        synthesis_system_prompt = f.read()
+
+    final_prompt_for_llm = f"""DATOS ORIGINALES (NO CAMBIAN):
 ---
 {prev_artifact['source_data']}
 ---
@@ -137,83 +294,169 @@ NUEVA INSTRUCCIÓN DEL USUARIO:
 '{user_message}'
 Tu tarea es generar una NUEVA versión del informe HTML completo, usando los DATOS ORIGINALES, pero aplicando la NUEVA INSTRUCCIÓN DEL USUARIO a la VERSIÓN ANTERIOR DEL INFORME.
 """
-            print(f"   -> Usando prompt de edición: {prompt_file_name}")
+    print(f"   -> Usando prompt de edición: {prompt_file_name}")
+    # La nueva versión conserva los datos originales del artefacto que se edita.
+    return {'system': synthesis_system_prompt, 'prompt': final_prompt_for_llm, 'source_data': prev_artifact['source_data'], 'prev_artifact': prev_artifact}
+
+def build_creation_synthesis(user_message: str, evidence_dossier: list[str]) -> dict:
+    """Flujo de creación, una vez recolectada la evidencia: elige el prompt y arma el mensaje para el LLM."""
+    tool_output = "El planificador decidió que no se requería ninguna herramienta."
+    if evidence_dossier: tool_output = "\n\n---\n\n".join(evidence_dossier)
+    source_data_for_saving = tool_output
+
+    if "informe del cobre" in user_message.lower():
+        prompt_file_name = 'prompt_cobre.txt'
+        example_path = os.path.join(project_root, 'data', 'examples', 'ejemplo_cobre.html')
+        prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
+        with open(example_path, 'r', encoding='utf-8') as f: html_example = f.read()
+        with open(prompt_path, 'r', encoding='utf-8') as f: synthesis_system_prompt = f.read() + "\n\n### EJEMPLO DE FORMATO DE SALIDA HTML ###\n" + html_example
+    else:
+        prompt_file_name = 'prompt_quantex.txt'
+        prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
+        with open(prompt_path, 'r', encoding='utf-8') as f: synthesis_system_prompt = f.read()
 
+    print(f"   -> Usando prompt: {prompt_file_name}")
+    final_prompt_for_llm = f"DATOS RECOLECTADOS:\n---\n{source_data_for_saving}\n---\n\nCon base en los datos anteriores, y siguiendo estrictamente tus instrucciones y formato, responde a la siguiente petición original del usuario: {user_message}"
+    return {'system': synthesis_system_prompt, 'prompt': final_prompt_for_llm, 'source_data': source_data_for_saving, 'prev_artifact': None}
+
+def prepare_synthesis(user_message: str, context_id=None, on_progress=None) -> dict:
+    """
+    Arma todo lo que necesita la llamada de síntesis: prompt de sistema, mensaje para el LLM,
+    datos fuente y artefacto previo (flujo de edición). `on_progress(fase, detalle)` se llama al
+    terminar cada fase del flujo de creación (reformulación, plan, herramientas).
+    Lanza LookupError si el artefacto a editar no existe.
+    """
+    on_progress = on_progress or (lambda phase, detail: None)
+    if context_id: return prepare_edit_synthesis(user_message, context_id)
+
+    print("   -> [Orquestador] Iniciando flujo de creación...")
+    clean_query = reformulate_query(user_message)
+    on_progress('reformulate', clean_query)
+    action_plan = decide_tool_to_use(clean_query)
+    on_progress('plan', action_plan)
+
+    action_list = action_plan if isinstance(action_plan, list) else [action_plan]
+    evidence_dossier = collect_evidence(action_list)
+    on_progress('tools', f"{len(evidence_dossier)} resultado(s) de herramientas")
+    return build_creation_synthesis(user_message, evidence_dossier)
+
+def finalize_response(user_message: str, context_id, synthesis: dict, final_response_text: str) -> dict:
+    """Si la respuesta es un informe HTML lo guarda en 'generated_artifacts'; devuelve el cuerpo de la respuesta al cliente."""
+    html_start_tag = "<!DOCTYPE html"
+    html_start_index = final_response_text.find(html_start_tag)
+    if html_start_index == -1:
+        return {"text_response": final_response_text}
+
+    html_content = final_response_text[html_start_index:]
+    print("   -> [Orquestador] Detectado informe HTML. Guardando en 'generated_artifacts'...")
+    prev_artifact = synthesis['prev_artifact']
+    try:
+        if context_id:
+            new_version = prev_artifact['version'] + 1
+            parent_id = context_id
+            artifact_type = prev_artifact['artifact_type']
         else:
-            print("   -> [Orquestador] Iniciando flujo de creación...")
-            clean_query = reformulate_query(user_message)
-            action_plan = decide_tool_to_use(clean_query)
-            
-            tool_output = "El planificador decidió que no se requería ninguna herramienta."
-            evidence_dossier = []
-            action_list = action_plan if isinstance(action_plan, list) else [action_plan]
-
-            for action in action_list:
-                if action and action.get('tool_name') in TOOL_MAPPING:
-                    tool_name, argument, date_filter, days_ago = action.get('tool_name'), action.get('argument'), action.get('date_filter'), action.get('days_ago')
-                    print(f"   -> [Orquestador] Ejecutando sub-tarea: {tool_name}('{argument}')...")
-                    tool_to_run = TOOL_MAPPING[tool_name]
-                    if tool_name == "get_news_articles": single_result = tool_to_run(topic=argument, date_filter=date_filter, days_ago=days_ago)
-                    elif tool_name == "get_market_data": single_result = tool_to_run(series_name=argument, date_filter=date_filter, days_ago=days_ago)
-                    else: single_result = "Herramienta desconocida."
-                    evidence_dossier.append(single_result)
-
-            if evidence_dossier: tool_output = "\n\n---\n\n".join(evidence_dossier)
-            source_data_for_saving = tool_output
-            
-            if "informe del cobre" in user_message.lower():
-                prompt_file_name = 'prompt_cobre.txt'
-                example_path = os.path.join(project_root, 'data', 'examples', 'ejemplo_cobre.html')
-                prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
-                with open(example_path, 'r', encoding='utf-8') as f: html_example = f.read()
-                with open(prompt_path, 'r', encoding='utf-8') as f: synthesis_system_prompt = f.read() + "\n\n### EJEMPLO DE FORMATO DE SALIDA HTML ###\n" + html_example
-            else:
-                prompt_file_name = 'prompt_quantex.txt'
-                prompt_path = os.path.join(project_root, 'prompts', prompt_file_name)
-                with open(prompt_path, 'r', encoding='utf-8') as f: synthesis_system_prompt = f.read()
-            
-            print(f"   -> Usando prompt: {prompt_file_name}")
-            final_prompt_for_llm = f"DATOS RECOLECTADOS:\n---\n{source_data_for_saving}\n---\n\nCon base en los datos anteriores, y siguiendo estrictamente tus instrucciones y formato, responde a la siguiente petición original del usuario: {user_message}"
-        
-        response = claude_client.messages.create(model="claude-3-5-sonnet-20240620", max_tokens=4096, system=synthesis_system_prompt, messages=[{"role": "user", "content": final_prompt_for_llm}])
-        final_response_text = response.content[0].text
-        
-        html_start_tag = "<!DOCTYPE html"
-        html_start_index = final_response_text.find(html_start_tag)
-        if html_start_index != -1:
-            html_content = final_response_text[html_start_index:]
-            print("   -> [Orquestador] Detectado informe HTML. Guardando en 'generated_artifacts'...")
-            try:
-                if context_id:
-                    new_version = prev_artifact['version'] + 1
-                    parent_id = context_id
-                    source_data_to_save = prev_artifact['source_data']
-                    artifact_type = prev_artifact['artifact_type']
-                else:
-                    new_version = 1
-                    parent_id = None
-                    artifact_type = 'cobre' 
-
-                artifact_payload = {'artifact_type': artifact_type, 'version': new_version, 'source_data': source_data_for_saving, 'full_content': html_content, 'user_prompt': user_message, 'parent_artifact_id': parent_id}
-                insert_res = supabase.table('generated_artifacts').insert(artifact_payload).execute()
-                
-                if insert_res.data:
-                    new_artifact_id = insert_res.data[0]['id']
-                    print(f"   -> ✅ Artefacto guardado con éxito. Nuevo ID: {new_artifact_id} (Versión {new_version})")
-                    return jsonify({"html_report": html_content, "artifact_id": new_artifact_id})
-                else:
-                    raise Exception("La inserción en Supabase no devolvió los datos.")
-            except Exception as e:
-                print(f"   -> ❌ Error al guardar el artefacto: {e}")
-                return jsonify({"html_report": html_content, "error_saving": str(e)})
+            new_version = 1
+            parent_id = None
+            artifact_type = 'cobre'
+
+        artifact_payload = {'artifact_type': artifact_type, 'version': new_version, 'source_data': synthesis['source_data'], 'full_content': html_content, 'user_prompt': user_message, 'parent_artifact_id': parent_id}
+        insert_res = supabase.table('generated_artifacts').insert(artifact_payload).execute()
+
+        if insert_res.data:
+            new_artifact_id = insert_res.data[0]['id']
+            print(f"   -> ✅ Artefacto guardado con éxito. Nuevo ID: {new_artifact_id} (Versión {new_version})")
+            return {"html_report": html_content, "artifact_id": new_artifact_id}
         else:
-             return jsonify({"text_response": final_response_text})
+            raise Exception("La inserción en Supabase no devolvió los datos.")
+    except Exception as e:
+        print(f"   -> ❌ Error al guardar el artefacto: {e}")
+        return {"html_report": html_content, "error_saving": str(e)}
+
+@app.route("/chat", methods=['POST'])
+def chat():
+    json_data = request.get_json()
+    user_message = json_data.get("message")
+    context_id = json_data.get("context_id")
+    if not user_message: return jsonify({"error": "No se recibió ningún mensaje."})
+    
+    print(f"💬 [Orquestador] Petición recibida: '{user_message}'")
+    if context_id: print(f"   -> En el contexto del artefacto: {context_id}")
+
+    try:
+        try:
+            synthesis = prepare_synthesis(user_message, context_id)
+        except LookupError as e:
+            return jsonify({"text_response": str(e)})
+
+        response = create_message('synthesis', model=SYNTHESIS_MODEL, max_tokens=SYNTHESIS_MAX_TOKENS, system=synthesis['system'], messages=[{"role": "user", "content": synthesis['prompt']}])
+        return jsonify(finalize_response(user_message, context_id, synthesis, response.content[0].text))
 
     except Exception as e:
         print(f"❌ Ocurrió un error en el Orquestador: {e}")
         return jsonify({"text_response": "Lo siento, ocurrió un error grave."})
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route("/chat/stream", methods=['POST'])
+def chat_stream():
+    """
+    Igual que /chat, pero responde con Server-Sent Events: eventos 'progress' por cada fase,
+    'token' con cada fragmento de la síntesis y, al final, 'done' con el mismo cuerpo que /chat
+    (el artefacto ya guardado). Un error en cualquier punto llega como evento 'error'.
+    """
+    json_data = request.get_json()
+    user_message = json_data.get("message")
+    context_id = json_data.get("context_id")
+    if not user_message: return jsonify({"error": "No se recibió ningún mensaje."})
+
+    print(f"💬 [Orquestador] Petición recibida (streaming): '{user_message}'")
+    if context_id: print(f"   -> En el contexto del artefacto: {context_id}")
+
+    def generate():
+        yield sse_event('progress', {'phase': 'start', 'detail': 'Petición recibida'})
+        progress_events = []
+        try:
+            # Las fases previas no generan texto; sus eventos se envían apenas termina cada una.
+            progress_queue = queue.Queue()
+            result = {}
+
+            def run_preparation():
+                try:
+                    result['synthesis'] = prepare_synthesis(user_message, context_id, on_progress=lambda phase, detail: progress_queue.put((phase, detail)))
+                except Exception as e:
+                    result['error'] = e
+                finally:
+                    progress_queue.put(None)
+
+            threading.Thread(target=run_preparation, name='chat-stream-prepare', daemon=True).start()
+            while (item := progress_queue.get()) is not None:
+                progress_events.append(item[0])
+                yield sse_event('progress', {'phase': item[0], 'detail': item[1]})
+            if 'error' in result:
+                if isinstance(result['error'], LookupError):
+                    yield sse_event('done', {"text_response": str(result['error'])})
+                    return
+                raise result['error']
+
+            synthesis = result['synthesis']
+            yield sse_event('progress', {'phase': 'synthesis', 'detail': 'Generando respuesta'})
+            chunks = []
+            for text in stream_text('synthesis', model=SYNTHESIS_MODEL, max_tokens=SYNTHESIS_MAX_TOKENS, system=synthesis['system'], messages=[{"role": "user", "content": synthesis['prompt']}]):
+                chunks.append(text)
+                yield sse_event('token', {'text': text})
+            # El artefacto se guarda solo con la respuesta completa.
+            yield sse_event('done', finalize_response(user_message, context_id, synthesis, ''.join(chunks)))
+        except Exception as e:
+            print(f"❌ Ocurrió un error en el Orquestador (streaming, tras {progress_events or 'inicio'}): {e}")
+            yield sse_event('error', {"text_response": "Lo siento, ocurrió un error grave."})
+
+    # X-Accel-Buffering: evita que un proxy intermedio acumule la respuesta antes de enviarla.
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == "__main__":
     # Para ejecutar este servidor, el comando sería:
     # flask --app quantex/api/server:app run
+    # Modo async (muchos chats simultáneos en un proceso): python quantex/api/async_server.py
     app.run(debug=True, port=5001)
\ No newline at end of file
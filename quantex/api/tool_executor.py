@@ -0,0 +1,87 @@
+# quantex/api/tool_executor.py
+# Ejecutor concurrente de las sub-tareas del plan de acción del Orquestador.
+
+import time
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# --- CONFIGURACIÓN ---
+MAX_WORKERS = 8  # Hilos totales compartidos por todas las peticiones /chat
+DEFAULT_TOOL_TIMEOUT = 20  # Segundos que esperamos a cada herramienta, contados desde que empieza a ejecutarse
+MAX_QUEUE_WAIT = 30  # Segundos que una tarea puede esperar hilo/cupo de backend antes de descartarse sin ejecutarse
+
+# Backend que consume cada herramienta y cuántas llamadas simultáneas admite.
+# El límite es global al proceso: lo comparten todas las peticiones en curso.
+TOOL_BACKENDS = {
+    "get_news_articles": "supabase",
+    "get_market_data": "supabase",
+}
+BACKEND_LIMITS = {
+    "supabase": 6,
+}
+TOOL_TIMEOUTS = {
+    "get_news_articles": 20,
+    "get_market_data": 20,
+}
+# ---------------------
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="quantex-tool")
+_backend_semaphores = {backend: threading.BoundedSemaphore(limit) for backend, limit in BACKEND_LIMITS.items()}
+
+
+def _run_with_backend_limit(tool_name: str, tool_fn, state: dict):
+    """
+    Ejecuta la herramienta respetando el cupo de concurrencia de su backend. Marca en `state`
+    cuándo empezó realmente (ya con hilo y cupo); si quien la espera ya la descartó, no se ejecuta.
+    """
+    semaphore = _backend_semaphores.get(TOOL_BACKENDS.get(tool_name))
+    with semaphore if semaphore is not None else contextlib.nullcontext():
+        with state['lock']:
+            if state['abandoned']: return None
+            state['started_at'] = time.monotonic()
+            state['started'].set()
+        return tool_fn()
+
+
+def run_tool_tasks(tasks: list[tuple[str, callable]]) -> list:
+    """
+    Ejecuta en paralelo una lista de sub-tareas `(tool_name, tool_fn)` y devuelve
+    sus resultados en el MISMO orden del plan. Una tarea que falla o excede su
+    tiempo límite devuelve un mensaje de error en su posición, sin afectar al resto.
+    El tiempo límite corre desde que la tarea empieza, no desde que se encola.
+    """
+    if not tasks:
+        return []
+
+    started_at = time.monotonic()
+    submitted = []
+    for tool_name, tool_fn in tasks:
+        state = {'lock': threading.Lock(), 'started': threading.Event(), 'started_at': None, 'abandoned': False}
+        submitted.append((tool_name, state, _executor.submit(_run_with_backend_limit, tool_name, tool_fn, state)))
+
+    results = []
+    for tool_name, state, future in submitted:
+        timeout = TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+        # 1) Esperamos a que consiga hilo y cupo; si no lo logra a tiempo, se descarta sin ejecutarse.
+        if not state['started'].wait(max(0.0, started_at + MAX_QUEUE_WAIT - time.monotonic())):
+            with state['lock']:
+                abandoned = state['abandoned'] = not state['started'].is_set()
+            if abandoned:
+                future.cancel()  # Libera el lugar en la cola si aún no la tomó ningún hilo
+                print(f"   -> ⚠️ [Ejecutor] '{tool_name}' no pudo empezar en {MAX_QUEUE_WAIT}s (ejecutor saturado).")
+                results.append(f"Error técnico: la herramienta '{tool_name}' no pudo ejecutarse, el servidor está saturado.")
+                continue
+        # 2) Ya empezó: su tiempo límite corre desde ese momento.
+        try:
+            results.append(future.result(timeout=max(0.0, state['started_at'] + timeout - time.monotonic())))
+        except FutureTimeoutError:
+            # Un hilo en ejecución no se puede interrumpir: termina en segundo plano y su resultado se ignora.
+            print(f"   -> ⚠️ [Ejecutor] '{tool_name}' excedió el tiempo límite de {timeout}s; sigue ejecutándose en segundo plano.")
+            results.append(f"Error técnico: la herramienta '{tool_name}' excedió el tiempo límite de {timeout} segundos.")
+        except Exception as e:
+            print(f"   -> ❌ [Ejecutor] Error en '{tool_name}': {e}")
+            results.append(f"Error técnico al ejecutar '{tool_name}': {e}")
+
+    print(f"   -> [Ejecutor] {len(tasks)} sub-tarea(s) completadas en {time.monotonic() - started_at:.2f}s.")
+    return results
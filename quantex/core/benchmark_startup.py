@@ -0,0 +1,78 @@
+# quantex/core/benchmark_startup.py
+# Mide cuánto cuesta importar cada punto de entrada (servidores, pipelines, búsqueda semántica)
+# usando `python -X importtime` en un proceso limpio, y lista los módulos más pesados.
+#
+# Uso:  python quantex/core/benchmark_startup.py [--top 10] [--only server,daemon]
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+# --- CONFIGURACIÓN ---
+PIPELINES_DIR = os.path.join(project_root, 'quantex', 'pipelines')
+# nombre -> (carpeta a añadir al path, módulo a importar)
+ENTRY_POINTS = {
+    'server': (project_root, 'quantex.api.server'),
+    'async_server': (project_root, 'quantex.api.async_server'),
+    'semantic_search': (project_root, 'quantex.core.semantic_search_provider'),
+    'generate_embeddings': (project_root, 'quantex.pipelines.generate_embeddings'),
+    'daemon': (PIPELINES_DIR, 'ingestion_daemon'),
+    'news_ingestor': (os.path.join(PIPELINES_DIR, 'news ingestion'), 'ingestor_main'),
+    'price_pipeline': (os.path.join(PIPELINES_DIR, 'price ingestion'), 'run_price_pipeline'),
+}
+DEFAULT_TOP = 8
+# ---------------------
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Líneas 'import time: self [us] | cumulative | módulo' -> [(módulo, self_us, cumulative_us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'): continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit(): continue # Cabecera
+        rows.append((parts[2][1:].rstrip(), int(parts[0]), int(parts[1]))) # Se conserva la sangría (anidamiento)
+    return rows
+
+def measure(name: str, search_path: str, module: str) -> dict:
+    """Importa `module` en un intérprete nuevo; el `-c` solo hace el import, así que el tiempo es el de arranque."""
+    code = f"import sys; sys.path.insert(0, {search_path!r}); import {module}"
+    started_at = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=project_root,
+                            capture_output=True, text=True, encoding='utf-8', errors='replace')
+    wall_seconds = time.perf_counter() - started_at
+    rows = _parse_importtime(result.stderr)
+    # Los módulos de primer nivel (sin sangría) suman el total; el resto ya está incluido en ellos.
+    top_level = [row for row in rows if not row[0].startswith(' ')]
+    error = None
+    if result.returncode != 0:
+        error = next((line for line in reversed(result.stderr.splitlines()) if line and not line.startswith('import time:')), 'error')
+    return {
+        'name': name, 'module': module, 'ok': result.returncode == 0, 'error': error,
+        'wall_s': round(wall_seconds, 2),
+        'import_s': round(sum(row[2] for row in top_level) / 1e6, 2),
+        'heaviest': sorted(((row[0].strip(), row[2]) for row in rows), key=lambda row: row[1], reverse=True),
+    }
+
+def print_report(results: list[dict], top: int):
+    print(f"\n{'punto de entrada':<22} {'imports (s)':>11} {'total (s)':>10}  estado")
+    for r in results:
+        print(f"{r['name']:<22} {r['import_s']:>11} {r['wall_s']:>10}  {'✅' if r['ok'] else '❌ ' + r['error']}")
+    for r in results:
+        print(f"\n--- {r['name']} ({r['module']}): {top} imports más pesados (acumulado) ---")
+        for module, cumulative_us in r['heaviest'][:top]:
+            print(f"  {cumulative_us / 1000:>9.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de los puntos de entrada de Quantex.")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Imports más pesados a mostrar por punto de entrada.")
+    parser.add_argument('--only', help=f"Puntos de entrada separados por coma ({', '.join(ENTRY_POINTS)}).")
+    args = parser.parse_args()
+    names = args.only.split(',') if args.only else list(ENTRY_POINTS)
+    print_report([measure(name, *ENTRY_POINTS[name]) for name in names], args.top)
@@ -0,0 +1,203 @@
+# quantex/core/embedding_service.py
+# Servicio de embeddings sobre el SentenceTransformer compartido:
+#   1) caché LRU en memoria por texto normalizado,
+#   2) micro-batching: las peticiones que llegan dentro de unos milisegundos se codifican en una sola pasada,
+#   3) caché persistente opcional en disco (SQLite), que sobrevive a reinicios.
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from dotenv import load_dotenv
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, '.env'))
+
+MEMORY_CACHE_SIZE = 4096
+BATCH_WINDOW_MS = 5      # Espera máxima para juntar peticiones concurrentes; 0 = codificar en el hilo que llama
+MAX_BATCH_SIZE = 64
+# Caché en disco; QUANTEX_EMBEDDING_DISK_CACHE=0 la desactiva.
+DISK_CACHE_ENABLED = os.environ.get("QUANTEX_EMBEDDING_DISK_CACHE", "1") != "0"
+DISK_CACHE_PATH = os.path.join(PROJECT_ROOT, 'data', 'cache', 'embeddings.sqlite3')
+# ---------------------
+
+
+def normalize_text(text: str) -> str:
+    """Espacios colapsados y minúsculas: el modelo (uncased) produce el mismo vector para ambas variantes."""
+    return ' '.join(text.split()).casefold()
+
+
+class _DiskCache:
+    """Tabla (modelo, texto) -> vector float32. Una conexión por hilo; SQLite serializa las escrituras entre procesos."""
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, text))")
+
+    def _connection(self) -> sqlite3.Connection:
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = sqlite3.connect(self.path, timeout=10)
+        return self._local.connection
+
+    def get_many(self, texts: list[str]) -> dict[str, np.ndarray]:
+        if not texts: return {}
+        placeholders = ','.join('?' * len(texts))
+        rows = self._connection().execute(f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({placeholders})",
+                                          [self.model_name, *texts]).fetchall()
+        return {text: np.frombuffer(vector, dtype=np.float32) for text, vector in rows}
+
+    def put_many(self, items: dict[str, np.ndarray]):
+        with self._connection() as connection:
+            connection.executemany("INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                                   [(self.model_name, text, np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in items.items()])
+
+
+class EmbeddingService:
+    """
+    `encode(texto | [textos])` devuelve los mismos vectores que `model.encode`, pero primero busca
+    en memoria y en disco, y los textos que faltan se envían a un hilo que agrupa las peticiones
+    de todos los hilos durante `batch_window_ms` antes de llamar al modelo una sola vez.
+    """
+
+    def __init__(self, model=None, model_name: str = None, cache_size: int = MEMORY_CACHE_SIZE, batch_window_ms: float = BATCH_WINDOW_MS,
+                 max_batch_size: int = MAX_BATCH_SIZE, disk_cache_path: str | None = DISK_CACHE_PATH if DISK_CACHE_ENABLED else None):
+        from quantex.core.resources import EMBEDDING_MODEL_NAME
+        self._model = model
+        self.model_name = model_name or EMBEDDING_MODEL_NAME
+        self.cache_size = cache_size
+        self.batch_window_seconds = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._worker = None
+        self._disk = None
+        if disk_cache_path:
+            try:
+                self._disk = _DiskCache(disk_cache_path, self.model_name)
+            except Exception as e:
+                print(f"⚠️ [Embeddings] Caché en disco deshabilitada: {e}")
+        self.metrics = {'memory_hits': 0, 'disk_hits': 0, 'encoded': 0, 'batches': 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from quantex.core.resources import get_embedding_model
+            self._model = get_embedding_model()
+        return self._model
+
+    # --- Caché en memoria ---
+    def _remember(self, items: dict[str, np.ndarray]):
+        with self._lock:
+            for text, vector in items.items():
+                self._memory[text] = vector
+                self._memory.move_to_end(text)
+            while len(self._memory) > self.cache_size:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, texts: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for text in texts:
+                vector = self._memory.get(text)
+                if vector is not None:
+                    self._memory.move_to_end(text)
+                    found[text] = vector
+            self.metrics['memory_hits'] += len(found)
+        missing = [text for text in texts if text not in found]
+        if self._disk is not None and missing:
+            try:
+                from_disk = self._disk.get_many(missing)
+            except Exception as e:
+                print(f"⚠️ [Embeddings] Error leyendo la caché en disco: {e}")
+                from_disk = {}
+            if from_disk:
+                self._remember(from_disk)
+                with self._lock:
+                    self.metrics['disk_hits'] += len(from_disk)
+                found.update(from_disk)
+        return found
+
+    # --- Codificación agrupada ---
+    def _encode_now(self, texts: list[str]) -> dict[str, np.ndarray]:
+        vectors = np.asarray(self.model.encode(texts, batch_size=max(len(texts), 1)), dtype=np.float32)
+        encoded = dict(zip(texts, vectors))
+        self._remember(encoded)
+        with self._lock:
+            self.metrics['encoded'] += len(texts)
+            self.metrics['batches'] += 1
+        if self._disk is not None:
+            try:
+                self._disk.put_many(encoded)
+            except Exception as e:
+                print(f"⚠️ [Embeddings] Error escribiendo la caché en disco: {e}")
+        return encoded
+
+    def _run_batcher(self):
+        while True:
+            batch = [self._pending.get()]
+            size = len(batch[0][0])
+            # Juntamos lo que llegue durante la ventana (o hasta llenar el lote).
+            deadline = time.monotonic() + self.batch_window_seconds
+            while size < self.max_batch_size and (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            unique_texts = list(dict.fromkeys(text for texts, _ in batch for text in texts))
+            try:
+                encoded = self._encode_now(unique_texts)
+            except Exception as e:
+                for _, future in batch: future.set_exception(e)
+                continue
+            for texts, future in batch:
+                future.set_result({text: encoded[text] for text in texts})
+
+    def _submit(self, texts: list[str]) -> dict[str, np.ndarray]:
+        if self.batch_window_seconds <= 0: return self._encode_now(texts)
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run_batcher, name='embedding-batcher', daemon=True)
+                    self._worker.start()
+        future = Future()
+        self._pending.put((texts, future))
+        return future.result()
+
+    def encode(self, texts):
+        """Un texto -> vector (d,); una lista -> matriz (n, d), en el mismo orden."""
+        single = isinstance(texts, str)
+        normalized = [normalize_text(text) for text in ([texts] if single else texts)]
+        unique_texts = list(dict.fromkeys(normalized))
+        found = self._lookup(unique_texts)
+        missing = [text for text in unique_texts if text not in found]
+        if missing: found.update(self._submit(missing))
+        if not normalized: return np.zeros((0, 0), dtype=np.float32)
+        vectors = np.stack([found[text] for text in normalized])
+        return vectors[0] if single else vectors
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            lookups = self.metrics['memory_hits'] + self.metrics['disk_hits'] + self.metrics['encoded']
+            return dict(self.metrics, memory_entries=len(self._memory), disk_cache=self._disk is not None,
+                        avg_batch_size=round(self.metrics['encoded'] / self.metrics['batches'], 2) if self.metrics['batches'] else None,
+                        hit_rate=round((lookups - self.metrics['encoded']) / lookups, 3) if lookups else None)
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Servicio compartido del proceso (registrado en `quantex.core.resources`)."""
+    from quantex.core.resources import registry
+    return registry.get('embedding_service')
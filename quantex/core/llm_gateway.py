@@ -0,0 +1,386 @@
+# quantex/core/llm_gateway.py
+# Puerta única hacia la API de Anthropic para todo el proceso: un cliente con pool de conexiones,
+# límite de peticiones y tokens por minuto, circuit breaker, reintentos con jitter y métricas por llamador.
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import httpx
+from dotenv import load_dotenv
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, '.env'))
+
+REQUESTS_PER_MINUTE = 50
+TOKENS_PER_MINUTE = 80000      # Entrada estimada + max_tokens reservados; se ajusta con el uso real
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+BREAKER_FAILURE_THRESHOLD = 5  # Fallos seguidos (sobrecarga / 5xx / red) que abren el circuito
+BREAKER_COOLDOWN_SECONDS = 30
+MAX_CONNECTIONS = 20
+REQUEST_TIMEOUT_SECONDS = 120
+CHARS_PER_TOKEN = 4            # Estimación gruesa para reservar tokens antes de la llamada
+# ---------------------
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la API viene fallando y no se envían peticiones por un rato."""
+
+
+class TokenBucket:
+    """Bucket que se rellena a `per_minute` unidades por minuto. `acquire` bloquea hasta tener saldo."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate_per_second = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def _try_take(self, amount: float) -> float:
+        """Descuenta `amount` si hay saldo (devuelve 0) o devuelve cuántos segundos faltan."""
+        amount = min(amount, self.capacity) # Una petición más grande que el bucket espera a tenerlo lleno
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate_per_second
+
+    def acquire(self, amount: float = 1):
+        while (wait_time := self._try_take(amount)) > 0:
+            time.sleep(wait_time)
+
+    async def acquire_async(self, amount: float = 1):
+        """Como `acquire`, pero cede el event loop mientras espera (modo async del servidor)."""
+        while (wait_time := self._try_take(amount)) > 0:
+            await asyncio.sleep(wait_time)
+
+    def adjust(self, amount: float):
+        """Devuelve (positivo) o descuenta (negativo) saldo tras conocer el consumo real."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class CircuitBreaker:
+    """
+    Cerrado: deja pasar todo. Tras `failure_threshold` fallos seguidos se abre y rechaza
+    las llamadas durante `cooldown_seconds`; luego deja pasar una sola de prueba (semi-abierto)
+    y vuelve a cerrarse si esa funciona.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown_seconds: float = BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Lanza CircuitOpenError si no se puede llamar; devuelve True si esta llamada es la de prueba (half-open)."""
+        with self._lock:
+            if self.state == 'closed': return False
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError(f"API de Anthropic no disponible temporalmente (circuito {self.state}).")
+
+    def record_success(self):
+        with self._lock:
+            self.state, self._failures, self._trial_in_flight = 'closed', 0, False
+
+    def release_trial(self):
+        """La llamada de prueba se canceló sin resultado: otra podrá intentarlo."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open': print(f"🔌 [LLM Gateway] Circuito abierto por {self.cooldown_seconds}s tras {self._failures} fallo(s).")
+                self.state, self._opened_at, self._trial_in_flight = 'open', time.monotonic(), False
+
+
+class LLMGateway:
+    """Un cliente de Anthropic compartido; cada llamada se identifica con `caller` para las métricas."""
+
+    def __init__(self, api_key: str = None, requests_per_minute: float = REQUESTS_PER_MINUTE, tokens_per_minute: float = TOKENS_PER_MINUTE,
+                 max_retries: int = MAX_RETRIES):
+        self._api_key = api_key
+        self._client = None
+        self._async_client = None
+        self._client_lock = threading.Lock()
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker()
+        self.max_retries = max_retries
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def client(self) -> 'anthropic.Anthropic':
+        """Se crea en la primera llamada (la clave puede venir de un .env cargado después del import)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import anthropic # El SDK tarda ~1s en importarse: no lo pagan los procesos que nunca llaman a Claude
+                    http_client = anthropic.DefaultHttpxClient(limits=self._http_limits())
+                    # Los reintentos los maneja el gateway (con el circuit breaker), no el SDK.
+                    self._client = anthropic.Anthropic(api_key=self._api_key or os.environ.get("ANTHROPIC_API_KEY"), max_retries=0,
+                                                       timeout=REQUEST_TIMEOUT_SECONDS, http_client=http_client)
+        return self._client
+
+    def _http_limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+
+    @property
+    def async_client(self) -> 'anthropic.AsyncAnthropic':
+        """Cliente async con su propio pool; debe usarse siempre desde el mismo event loop."""
+        if self._async_client is None:
+            with self._client_lock:
+                if self._async_client is None:
+                    import anthropic
+                    self._async_client = anthropic.AsyncAnthropic(api_key=self._api_key or os.environ.get("ANTHROPIC_API_KEY"), max_retries=0,
+                                                                  timeout=REQUEST_TIMEOUT_SECONDS, http_client=anthropic.DefaultAsyncHttpxClient(limits=self._http_limits()))
+        return self._async_client
+
+    @staticmethod
+    def _estimate_tokens(kwargs: dict) -> int:
+        text_chars = len(kwargs.get('system') or '') if isinstance(kwargs.get('system'), str) else 0
+        for message in kwargs.get('messages', []):
+            content = message.get('content')
+            text_chars += len(content) if isinstance(content, str) else sum(len(block.get('text', '')) for block in content if isinstance(block, dict))
+        return text_chars // CHARS_PER_TOKEN + kwargs.get('max_tokens', 0)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        import anthropic
+        if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)): return True
+        return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+    @staticmethod
+    def _backoff_seconds(attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+        # "Full jitter": cada llamador espera un tiempo distinto, así no reintentan todos a la vez.
+        backoff = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        return max(backoff, retry_after or 0)
+
+    def _record(self, caller: str, latency: float = None, usage=None, error: bool = False, retried: bool = False, rejected: bool = False):
+        with self._metrics_lock:
+            m = self._metrics.setdefault(caller, {'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0, 'input_tokens': 0, 'output_tokens': 0,
+                                                  'latency_total': 0.0, 'latencies': deque(maxlen=200)})
+            if retried: m['retries'] += 1
+            if rejected: m['rejected'] += 1
+            if error: m['errors'] += 1
+            if latency is not None:
+                m['calls'] += 1
+                m['latency_total'] += latency
+                m['latencies'].append(latency)
+            if usage is not None:
+                m['input_tokens'] += getattr(usage, 'input_tokens', 0) or 0
+                m['output_tokens'] += getattr(usage, 'output_tokens', 0) or 0
+
+    def _check_breaker(self, caller: str) -> bool:
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            self._record(caller, rejected=True)
+            raise
+
+    def _before_request(self, caller: str, kwargs: dict) -> int:
+        self._check_breaker(caller)
+        reserved_tokens = self._estimate_tokens(kwargs)
+        self.request_bucket.acquire()
+        self.token_bucket.acquire(reserved_tokens)
+        return reserved_tokens
+
+    async def _before_request_async(self, caller: str, kwargs: dict) -> tuple[int, bool]:
+        """Devuelve (tokens reservados, si esta llamada tiene la prueba del circuito half-open)."""
+        is_trial = self._check_breaker(caller)
+        reserved_tokens = self._estimate_tokens(kwargs)
+        try:
+            await self.request_bucket.acquire_async()
+            await self.token_bucket.acquire_async(reserved_tokens)
+        except asyncio.CancelledError:
+            # Cancelada mientras esperaba cupo: si tenía la llamada de prueba, la libera para que otra la tome.
+            if is_trial: self.breaker.release_trial()
+            raise
+        return reserved_tokens, is_trial
+
+    def _after_success(self, caller: str, started_at: float, usage, reserved_tokens: int):
+        self.breaker.record_success()
+        self._record(caller, latency=time.monotonic() - started_at, usage=usage)
+        if usage is not None:
+            self.token_bucket.adjust(reserved_tokens - (usage.input_tokens + usage.output_tokens))
+
+    def _handle_error(self, caller: str, attempt: int, error: Exception) -> float | None:
+        """Registra el fallo y devuelve cuánto esperar antes de reintentar, o None si no se reintenta."""
+        retryable = self._is_retryable(error)
+        # Un error no reintentable (p. ej. 400) significa que la API sí respondió: no abre el circuito.
+        if retryable: self.breaker.record_failure()
+        else: self.breaker.record_success()
+        if not retryable or attempt >= self.max_retries - 1:
+            self._record(caller, error=True)
+            return None
+        self._record(caller, retried=True)
+        wait_time = self._backoff_seconds(attempt, error)
+        print(f"   -> ⚠️ [LLM Gateway] {caller}: {type(error).__name__}. Reintentando en {wait_time:.1f}s ({attempt + 1}/{self.max_retries})...")
+        return wait_time
+
+    def create_message(self, caller: str, **kwargs):
+        """
+        Equivalente a `client.messages.create(**kwargs)` pasando por los límites compartidos.
+        Lanza la última excepción si se agotan los reintentos, o CircuitOpenError si el circuito está abierto.
+        """
+        for attempt in range(self.max_retries):
+            reserved_tokens = self._before_request(caller, kwargs)
+            started_at = time.monotonic()
+            try:
+                response = self.client.messages.create(**kwargs)
+            except Exception as e:
+                wait_time = self._handle_error(caller, attempt, e)
+                if wait_time is None: raise
+                time.sleep(wait_time)
+                continue
+            self._after_success(caller, started_at, getattr(response, 'usage', None), reserved_tokens)
+            return response
+
+    def stream_text(self, caller: str, **kwargs):
+        """
+        Igual que `create_message` pero con la API de streaming: va entregando los fragmentos de
+        texto a medida que llegan. Solo se reintenta si el error ocurre antes del primer
+        fragmento; a mitad de respuesta el error se propaga para no duplicar texto ya enviado.
+        """
+        for attempt in range(self.max_retries):
+            reserved_tokens = self._before_request(caller, kwargs)
+            started_at = time.monotonic()
+            emitted = False
+            try:
+                with self.client.messages.stream(**kwargs) as stream:
+                    for text in stream.text_stream:
+                        emitted = True
+                        yield text
+                    final_message = stream.get_final_message()
+            except GeneratorExit:
+                # El cliente cortó la conexión: la API sí estaba respondiendo.
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                if emitted:
+                    if self._is_retryable(e): self.breaker.record_failure()
+                    self._record(caller, error=True)
+                    raise
+                wait_time = self._handle_error(caller, attempt, e)
+                if wait_time is None: raise
+                time.sleep(wait_time)
+                continue
+            self._after_success(caller, started_at, getattr(final_message, 'usage', None), reserved_tokens)
+            return
+
+    async def create_message_async(self, caller: str, **kwargs):
+        """Versión async de `create_message`: mismos límites, circuito y métricas, sin bloquear el event loop."""
+        for attempt in range(self.max_retries):
+            reserved_tokens, is_trial = await self._before_request_async(caller, kwargs)
+            started_at = time.monotonic()
+            try:
+                response = await self.async_client.messages.create(**kwargs)
+            except asyncio.CancelledError:
+                # Solo quien tiene la prueba la libera; una llamada normal cancelada no debe habilitar una segunda prueba.
+                if is_trial: self.breaker.release_trial()
+                raise
+            except Exception as e:
+                wait_time = self._handle_error(caller, attempt, e)
+                if wait_time is None: raise
+                await asyncio.sleep(wait_time)
+                continue
+            self._after_success(caller, started_at, getattr(response, 'usage', None), reserved_tokens)
+            return response
+
+    async def stream_text_async(self, caller: str, **kwargs):
+        """Versión async de `stream_text` (generador asíncrono de fragmentos de texto)."""
+        for attempt in range(self.max_retries):
+            reserved_tokens, is_trial = await self._before_request_async(caller, kwargs)
+            started_at = time.monotonic()
+            emitted = False
+            try:
+                async with self.async_client.messages.stream(**kwargs) as stream:
+                    async for text in stream.text_stream:
+                        emitted = True
+                        yield text
+                    final_message = await stream.get_final_message()
+            except (GeneratorExit, asyncio.CancelledError):
+                # El cliente cortó la conexión: solo es señal de salud si la API ya había respondido.
+                if emitted: self.breaker.record_success()
+                elif is_trial: self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if emitted:
+                    if self._is_retryable(e): self.breaker.record_failure()
+                    self._record(caller, error=True)
+                    raise
+                wait_time = self._handle_error(caller, attempt, e)
+                if wait_time is None: raise
+                await asyncio.sleep(wait_time)
+                continue
+            self._after_success(caller, started_at, getattr(final_message, 'usage', None), reserved_tokens)
+            return
+
+    def get_metrics(self) -> dict:
+        """Métricas por llamador: llamadas, errores, reintentos, tokens y latencias (promedio y p95)."""
+        with self._metrics_lock:
+            report = {}
+            for caller, m in self._metrics.items():
+                latencies = sorted(m['latencies'])
+                report[caller] = {key: m[key] for key in ('calls', 'errors', 'retries', 'rejected', 'input_tokens', 'output_tokens')}
+                report[caller]['avg_latency_seconds'] = round(m['latency_total'] / m['calls'], 3) if m['calls'] else None
+                report[caller]['p95_latency_seconds'] = round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None
+        return {'circuit': self.breaker.state, 'callers': report}
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway() -> LLMGateway:
+    """Gateway compartido por todo el proceso (servidor, agentes y pipelines)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None: _gateway = LLMGateway()
+    return _gateway
+
+def create_message(caller: str, **kwargs):
+    return get_llm_gateway().create_message(caller, **kwargs)
+
+def stream_text(caller: str, **kwargs):
+    return get_llm_gateway().stream_text(caller, **kwargs)
+
+async def create_message_async(caller: str, **kwargs):
+    return await get_llm_gateway().create_message_async(caller, **kwargs)
+
+def stream_text_async(caller: str, **kwargs):
+    return get_llm_gateway().stream_text_async(caller, **kwargs)
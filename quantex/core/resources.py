@@ -0,0 +1,103 @@
+# quantex/core/resources.py
+# Registro de recursos pesados (clientes y modelos) compartidos por todo el proceso.
+# Cada recurso se construye la primera vez que alguien lo pide, y una sola vez aunque lo pidan varios hilos.
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, '.env'))
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# ---------------------
+
+
+class ResourceRegistry:
+    """
+    `register(nombre, fábrica)` declara cómo construir un recurso sin construirlo; `get(nombre)`
+    lo construye en el primer uso y luego devuelve siempre la misma instancia. `preload` permite
+    calentarlos por adelantado (p. ej. al arrancar el servidor).
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, factory):
+        with self._registry_lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        if name in self._instances: return self._instances[name]
+        if name not in self._factories: raise KeyError(f"Recurso desconocido: '{name}'.")
+        with self._locks[name]:
+            if name not in self._instances: # Otro hilo pudo construirlo mientras esperábamos
+                started_at = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._load_seconds[name] = round(time.perf_counter() - started_at, 3)
+                print(f"⚙️ [Recursos] '{name}' listo en {self._load_seconds[name]:.2f}s.")
+        return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def preload(self, names: list[str]):
+        """Construye los recursos indicados; un fallo se informa y no impide cargar el resto."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"❌ [Recursos] No se pudo precargar '{name}': {e}")
+
+    def status(self) -> dict:
+        return {name: {'loaded': name in self._instances, 'load_seconds': self._load_seconds.get(name)} for name in self._factories}
+
+
+def _build_supabase():
+    from supabase import create_client
+    return create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY"))
+
+def _build_embedding_model():
+    from sentence_transformers import SentenceTransformer # Import pesado (torch): solo cuando se necesita
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def _build_llm_gateway():
+    from quantex.core.llm_gateway import get_llm_gateway
+    gateway = get_llm_gateway()
+    gateway.client # El gateway crea el cliente (e importa el SDK de Anthropic) recién aquí, no al construirse
+    return gateway
+
+def _build_embedding_service():
+    from quantex.core.embedding_service import EmbeddingService
+    return EmbeddingService()
+
+def _build_series_vector_index():
+    from quantex.core.series_vector_index import SeriesVectorIndex
+    return SeriesVectorIndex().build()
+
+
+registry = ResourceRegistry()
+registry.register('supabase', _build_supabase)
+registry.register('embedding_model', _build_embedding_model)
+registry.register('embedding_service', _build_embedding_service)
+registry.register('llm_gateway', _build_llm_gateway)
+registry.register('series_vector_index', _build_series_vector_index)
+
+def get_supabase():
+    """Cliente de Supabase (service key) compartido."""
+    return registry.get('supabase')
+
+def get_embedding_model():
+    """Modelo SentenceTransformer compartido; se carga recién en la primera búsqueda o embedding."""
+    return registry.get('embedding_model')
+
+def preload(names: list[str]):
+    registry.preload(names)
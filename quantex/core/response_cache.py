@@ -0,0 +1,147 @@
+# quantex/core/response_cache.py
+# Caché en memoria de las respuestas de los sub-agentes (reformulador y planificador).
+# Nivel 1: coincidencia exacta (LRU). Nivel 2, opcional: consulta semánticamente casi idéntica.
+
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+# --- CONFIGURACIÓN ---
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 6 * 3600   # Las respuestas dependen solo del prompt y la consulta, no de datos de mercado
+SEMANTIC_THRESHOLD = 0.92        # Similitud coseno mínima para reutilizar una respuesta del nivel 2
+# ---------------------
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas, sin tildes, espacios colapsados y sin puntuación final: '¿Informe del Cobre?' == 'informe del cobre'."""
+    folded = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c)).casefold()
+    return ' '.join(folded.split()).strip(' ?¿!¡.')
+
+
+def _default_embed_fn():
+    """Usa el servicio de embeddings compartido; el modelo se carga solo cuando se activa el nivel semántico."""
+    from quantex.core.embedding_service import get_embedding_service
+    return get_embedding_service().encode
+
+
+class ResponseCache:
+    """
+    Clave = (hash del prompt de sistema, modelo, consulta normalizada): si el archivo de
+    prompt cambia, las entradas viejas simplemente dejan de coincidir. Las entradas vencen
+    a los `ttl_seconds` y, al superar `max_entries`, se descarta la usada hace más tiempo.
+    Con `semantic=True`, ante un fallo exacto se busca la entrada más parecida (mismo prompt
+    y modelo) cuyo embedding supere `semantic_threshold`.
+    """
+
+    def __init__(self, name: str, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 semantic: bool = False, semantic_threshold: float = SEMANTIC_THRESHOLD, embed_fn=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.semantic_threshold = semantic_threshold
+        self._embed_fn = embed_fn
+        self._entries = OrderedDict()  # key -> {'value', 'created_at', 'embedding'}
+        self._lock = threading.Lock()
+        self.metrics = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    @staticmethod
+    def _key(prompt: str, model: str, query: str) -> tuple:
+        return (hashlib.sha256(prompt.encode('utf-8')).hexdigest(), model, normalize_query(query))
+
+    def _embed(self, normalized_query: str):
+        if self._embed_fn is None: self._embed_fn = _default_embed_fn()
+        vector = np.asarray(self._embed_fn(normalized_query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _count(self, metric: str):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def _semantic_lookup(self, key: tuple):
+        try:
+            query_vector = self._embed(key[2])
+        except Exception as e:
+            print(f"   -> ⚠️ [Caché {self.name}] Nivel semántico no disponible: {e}")
+            self.semantic = False
+            return None, None
+        best_key, best_score = None, self.semantic_threshold
+        with self._lock:
+            for entry_key, entry in self._entries.items():
+                if entry_key[:2] != key[:2] or entry['embedding'] is None: continue
+                score = float(np.dot(query_vector, entry['embedding']))
+                if score >= best_score: best_key, best_score = entry_key, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                return self._entries[best_key]['value'], query_vector
+        return None, query_vector
+
+    def get(self, prompt: str, model: str, query: str):
+        """Devuelve la respuesta cacheada o None."""
+        key = self._key(prompt, model, query)
+        now = time.time()
+        with self._lock:
+            # Las entradas vencidas se eliminan al pasar por ellas (el OrderedDict va de la más antigua a la más reciente en uso).
+            for expired_key in [k for k, entry in self._entries.items() if now - entry['created_at'] > self.ttl_seconds]:
+                del self._entries[expired_key]
+                self.metrics['expired'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.metrics['exact_hits'] += 1
+                return entry['value']
+        if self.semantic:
+            value, _ = self._semantic_lookup(key)
+            if value is not None:
+                print(f"   -> [Caché {self.name}] Reutilizando la respuesta de una consulta casi idéntica.")
+                self._count('semantic_hits')
+                return value
+        self._count('misses')
+        return None
+
+    def put(self, prompt: str, model: str, query: str, value):
+        key = self._key(prompt, model, query)
+        embedding = None
+        if self.semantic:
+            try:
+                embedding = self._embed(key[2])
+            except Exception as e:
+                print(f"   -> ⚠️ [Caché {self.name}] Nivel semántico no disponible: {e}")
+                self.semantic = False
+        with self._lock:
+            self._entries[key] = {'value': value, 'created_at': time.time(), 'embedding': embedding}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            lookups = self.metrics['exact_hits'] + self.metrics['semantic_hits'] + self.metrics['misses']
+            hit_rate = (self.metrics['exact_hits'] + self.metrics['semantic_hits']) / lookups if lookups else None
+            return dict(self.metrics, entries=len(self._entries), semantic=self.semantic,
+                        hit_rate=round(hit_rate, 3) if hit_rate is not None else None)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_response_cache(name: str, **kwargs) -> ResponseCache:
+    """Una caché por sub-agente, compartida por todo el proceso. `kwargs` solo aplica al crearla."""
+    with _caches_lock:
+        if name not in _caches: _caches[name] = ResponseCache(name, **kwargs)
+        return _caches[name]
+
+def get_all_cache_metrics() -> dict:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_metrics() for cache in caches}
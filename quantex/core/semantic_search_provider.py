@@ -1,49 +1,56 @@
 # data_workers/semantic_search_provider.py
 
 import os
+import sys
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
 
 # --- INICIALIZACIÓN DE CLIENTES Y MODELOS ---
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+# El cliente, el servicio de embeddings y el índice se construyen en la primera búsqueda (no al importar) y se comparten con el resto del proceso.
+from quantex.core.resources import get_supabase
+from quantex.core.embedding_service import get_embedding_service
+from quantex.core.series_vector_index import get_series_vector_index
 
-try:
-    print("[SEMANTIC_SEARCH] Cargando modelo de embeddings...")
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    print("[SEMANTIC_SEARCH] ✅ Modelo cargado.")
-except Exception as e:
-    print(f"[SEMANTIC_SEARCH] ❌ No se pudo cargar el modelo de embeddings: {e}")
-    embedding_model = None
+# --- BÚSQUEDA EN SUPABASE (respaldo si el índice local no está disponible) ---
+def _match_series_remote(query_embedding: list, match_count: int, match_threshold: float) -> list[dict]:
+    params = {
+        'query_embedding': query_embedding,
+        'match_threshold': match_threshold,
+        'match_count': match_count
+    }
+    response = get_supabase().rpc('match_series_by_name', params).execute()
+    return response.data or []
 
-# --- FUNCIÓN PRINCIPAL DE BÚSQUEDA ---
-def find_relevant_series(user_query: str, match_count: int = 3, match_threshold: float = 0.5) -> list[dict]:
-    if not embedding_model:
-        print("  -> ❌ Búsqueda semántica deshabilitada, modelo no cargado.")
-        return []
+# --- FUNCIONES PRINCIPALES DE BÚSQUEDA ---
+def find_relevant_series_batch(user_queries: list[str], match_count: int = 3, match_threshold: float = 0.5) -> list[list[dict]]:
+    """Resuelve varias consultas con una sola pasada del modelo y una sola multiplicación contra el índice local."""
+    print(f"[SEMANTIC_SEARCH] Buscando series relevantes para {len(user_queries)} consulta(s): {user_queries}")
+    try:
+        # Caché por texto y agrupación con las búsquedas concurrentes de otros hilos.
+        query_embeddings = get_embedding_service().encode(user_queries)
+    except Exception as e:
+        print(f"  -> ❌ Búsqueda semántica deshabilitada, no se pudo generar el embedding: {e}")
+        return [[] for _ in user_queries]
 
-    print(f"[SEMANTIC_SEARCH] Buscando series relevantes para: '{user_query}'")
     try:
-        query_embedding = embedding_model.encode(user_query).tolist()
-        params = {
-            'query_embedding': query_embedding,
-            'match_threshold': match_threshold,
-            'match_count': match_count
-        }
-        response = supabase.rpc('match_series_by_name', params).execute()
-
-        if response.data:
-            print(f"  -> Se encontraron {len(response.data)} series relevantes.")
-            return response.data 
-        else:
-            print("  -> No se encontraron series relevantes por encima del umbral.")
-            return []
-            
+        index = get_series_vector_index()
+        if len(index) == 0: raise LookupError("el catálogo no tiene series con embedding")
+        results = index.search(query_embeddings, match_count, match_threshold)
     except Exception as e:
-        print(f"  -> ❌ Error durante la búsqueda semántica: {e}")
-        return []
\ No newline at end of file
+        print(f"  -> ⚠️ Índice local no disponible ({e}); consultando Supabase.")
+        try:
+            results = [_match_series_remote(embedding.tolist(), match_count, match_threshold) for embedding in query_embeddings]
+        except Exception as e:
+            print(f"  -> ❌ Error durante la búsqueda semántica: {e}")
+            return [[] for _ in user_queries]
+
+    for user_query, matches in zip(user_queries, results):
+        if matches: print(f"  -> '{user_query}': se encontraron {len(matches)} series relevantes.")
+        else: print(f"  -> '{user_query}': no se encontraron series relevantes por encima del umbral.")
+    return results
+
+def find_relevant_series(user_query: str, match_count: int = 3, match_threshold: float = 0.5) -> list[dict]:
+    return find_relevant_series_batch([user_query], match_count, match_threshold)[0]
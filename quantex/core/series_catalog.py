@@ -0,0 +1,117 @@
+# quantex/core/series_catalog.py
+# Catálogo en memoria de `series_definitions`, compartido por el servidor, los proveedores y los pipelines.
+
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, '.env'))
+
+CATALOG_TTL_SECONDS = 600  # Refresco periódico aunque nadie invalide
+CATALOG_COLUMNS = 'id, series_name, unit, category, embedding'
+# Archivo "sello" que la ingesta toca para avisar a otros procesos que las definiciones cambiaron.
+INVALIDATION_STAMP_PATH = os.path.join(PROJECT_ROOT, 'data', 'cache', 'series_catalog.stamp')
+# ---------------------
+
+
+class SeriesCatalog:
+    """
+    Mapa series_name -> {id, unit, category, embedding} cargado con una sola consulta.
+    Se recarga al vencer el TTL o cuando alguien llama a `invalidate()` (en este
+    proceso o en otro, a través del archivo sello). Seguro para hilos de Flask.
+    """
+
+    def __init__(self, supabase_client=None, ttl_seconds: float = CATALOG_TTL_SECONDS, stamp_path: str = INVALIDATION_STAMP_PATH):
+        self._client = supabase_client
+        self._ttl_seconds = ttl_seconds
+        self._stamp_path = stamp_path
+        self._lock = threading.Lock()
+        self._by_name = {}
+        self._loaded_at = None  # time.time() de la última carga exitosa
+
+    def _get_client(self):
+        if self._client is None:
+            from quantex.core.resources import get_supabase
+            self._client = get_supabase()
+        return self._client
+
+    def _stamp_mtime(self) -> float:
+        try:
+            return os.path.getmtime(self._stamp_path)
+        except OSError:
+            return 0.0
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None: return True
+        if time.time() - self._loaded_at > self._ttl_seconds: return True
+        return self._stamp_mtime() > self._loaded_at
+
+    def _refresh_if_needed(self):
+        if not self._is_stale(): return
+        with self._lock:
+            if not self._is_stale(): return # Otro hilo ya lo recargó mientras esperábamos
+            loaded_at = time.time()
+            try:
+                response = self._get_client().table('series_definitions').select(CATALOG_COLUMNS).execute()
+            except Exception as e:
+                # Con un catálogo previo seguimos sirviendo la versión anterior en vez de fallar.
+                print(f"[SERIES_CATALOG] ❌ No se pudo recargar el catálogo: {e}")
+                if self._loaded_at is None: raise
+                return
+            # Reemplazamos el dict completo: los lectores nunca ven un mapa a medio construir.
+            self._by_name = {row['series_name']: row for row in (response.data or [])}
+            self._loaded_at = loaded_at
+            print(f"[SERIES_CATALOG] ✅ Catálogo cargado con {len(self._by_name)} series.")
+
+    def get(self, series_name: str) -> dict | None:
+        """Devuelve la definición de una serie o None si no existe."""
+        self._refresh_if_needed()
+        return self._by_name.get(series_name)
+
+    def get_many(self, series_names: list[str]) -> dict[str, dict]:
+        """Devuelve {series_name: definición} solo para las series que existen."""
+        self._refresh_if_needed()
+        by_name = self._by_name
+        return {name: by_name[name] for name in series_names if name in by_name}
+
+    def all(self) -> dict[str, dict]:
+        """Devuelve una copia del catálogo completo."""
+        self._refresh_if_needed()
+        return dict(self._by_name)
+
+    @property
+    def loaded_at(self) -> float | None:
+        """Momento de la última carga; cambia cada vez que el catálogo se recarga (lo usa el índice vectorial)."""
+        return self._loaded_at
+
+    def invalidate(self, notify_other_processes: bool = True):
+        """Fuerza la recarga en el próximo acceso y, opcionalmente, avisa a otros procesos."""
+        with self._lock:
+            self._loaded_at = None
+        if notify_other_processes:
+            try:
+                os.makedirs(os.path.dirname(self._stamp_path), exist_ok=True)
+                with open(self._stamp_path, 'w', encoding='utf-8') as f:
+                    f.write(str(time.time()))
+            except OSError as e:
+                print(f"[SERIES_CATALOG] ⚠️ No se pudo escribir el sello de invalidación: {e}")
+
+
+# --- INSTANCIA COMPARTIDA DEL PROCESO ---
+_default_catalog = SeriesCatalog()
+
+def get_series_catalog() -> SeriesCatalog:
+    return _default_catalog
+
+def get_series(series_name: str) -> dict | None:
+    return _default_catalog.get(series_name)
+
+def get_many_series(series_names: list[str]) -> dict[str, dict]:
+    return _default_catalog.get_many(series_names)
+
+def invalidate_series_catalog(notify_other_processes: bool = True):
+    _default_catalog.invalidate(notify_other_processes)
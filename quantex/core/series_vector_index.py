@@ -0,0 +1,133 @@
+# quantex/core/series_vector_index.py
+# Índice vectorial en memoria sobre los embeddings de `series_definitions`.
+# Reemplaza el RPC `match_series_by_name`: con unas decenas de series, un producto punto
+# local resuelve en microsegundos lo que el viaje a Supabase tarda cientos de milisegundos.
+
+import os
+import json
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+load_dotenv(dotenv_path=os.path.join(PROJECT_ROOT, '.env'))
+
+# 'numpy' (por defecto) o 'faiss' (IndexFlatIP; si faiss no está instalado se usa numpy).
+VECTOR_INDEX_BACKEND = os.environ.get("QUANTEX_VECTOR_BACKEND", "numpy")
+RESULT_COLUMNS = ('id', 'series_name', 'unit', 'category')
+# ---------------------
+
+
+def parse_embedding(value) -> np.ndarray | None:
+    """Supabase devuelve las columnas `vector` como texto '[0.1,...]'; también aceptamos listas."""
+    if value is None: return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    vector = np.asarray(value, dtype=np.float32)
+    return vector if vector.ndim == 1 and vector.size else None
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SeriesVectorIndex:
+    """
+    Matriz normalizada (una fila por serie con embedding) construida a partir del catálogo
+    compartido. Cada búsqueda pasa por el catálogo, que se recarga por TTL o cuando alguien
+    lo invalida (p. ej. `generate_embeddings` al escribir vectores nuevos); si la carga
+    cambió, el índice se reconstruye antes de responder.
+    """
+
+    def __init__(self, catalog=None, backend: str = VECTOR_INDEX_BACKEND):
+        self._catalog = catalog
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._built_from = None # `loaded_at` del catálogo con el que se construyó
+        self._state = (np.zeros((0, 0), dtype=np.float32), [], None) # (matriz, filas, índice faiss)
+
+    def _get_catalog(self):
+        if self._catalog is None:
+            from quantex.core.series_catalog import get_series_catalog
+            self._catalog = get_series_catalog()
+        return self._catalog
+
+    def _build_faiss(self, matrix: np.ndarray):
+        try:
+            import faiss
+        except ImportError:
+            print("[VECTOR_INDEX] ⚠️ faiss no está instalado; se usa el backend numpy.")
+            self.backend = 'numpy'
+            return None
+        faiss_index = faiss.IndexFlatIP(matrix.shape[1])
+        faiss_index.add(matrix)
+        return faiss_index
+
+    def _rebuild_if_needed(self):
+        catalog = self._get_catalog()
+        definitions = catalog.all() # Dispara la recarga del catálogo si venció o fue invalidado
+        if catalog.loaded_at == self._built_from: return
+        with self._lock:
+            if catalog.loaded_at == self._built_from: return
+            rows, vectors = [], []
+            for definition in definitions.values():
+                vector = parse_embedding(definition.get('embedding'))
+                if vector is None: continue
+                if vectors and vector.shape != vectors[0].shape:
+                    print(f"[VECTOR_INDEX] ⚠️ '{definition.get('series_name')}' tiene un embedding de otra dimensión; se omite.")
+                    continue
+                rows.append({column: definition.get(column) for column in RESULT_COLUMNS})
+                vectors.append(vector)
+            matrix = _normalize_rows(np.vstack(vectors)) if vectors else np.zeros((0, 0), dtype=np.float32)
+            faiss_index = self._build_faiss(matrix) if self.backend == 'faiss' and vectors else None
+            self._state = (matrix, rows, faiss_index)
+            self._built_from = catalog.loaded_at
+            print(f"[VECTOR_INDEX] ✅ Índice construido con {len(rows)} series ({self.backend}).")
+
+    def build(self) -> 'SeriesVectorIndex':
+        """Construye el índice por adelantado (si no, se construye en la primera búsqueda)."""
+        self._rebuild_if_needed()
+        return self
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def search(self, query_vectors, match_count: int = 3, match_threshold: float = 0.5) -> list[list[dict]]:
+        """
+        `query_vectors`: un vector o una matriz (una consulta por fila). Devuelve, por consulta,
+        hasta `match_count` series con similitud coseno >= `match_threshold`, de mayor a menor.
+        """
+        self._rebuild_if_needed()
+        matrix, rows, faiss_index = self._state
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if not rows or match_count <= 0: return [[] for _ in range(len(queries))]
+        if queries.shape[1] != matrix.shape[1]:
+            raise ValueError(f"Dimensión de la consulta ({queries.shape[1]}) distinta a la del índice ({matrix.shape[1]}).")
+        queries = _normalize_rows(queries)
+        k = min(match_count, len(rows))
+
+        if faiss_index is not None:
+            scores, positions = faiss_index.search(np.ascontiguousarray(queries), k)
+        else:
+            similarities = queries @ matrix.T
+            # argpartition deja los k mejores (sin orden) al principio; solo esos se ordenan.
+            positions = np.argpartition(-similarities, k - 1, axis=1)[:, :k] if k < len(rows) else np.tile(np.arange(len(rows)), (len(queries), 1))
+            scores = np.take_along_axis(similarities, positions, axis=1)
+            order = np.argsort(-scores, axis=1)
+            positions, scores = np.take_along_axis(positions, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+        return [[dict(rows[position], similarity=float(score))
+                 for position, score in zip(query_positions, query_scores) if position >= 0 and score >= match_threshold]
+                for query_positions, query_scores in zip(positions, scores)]
+
+
+def get_series_vector_index() -> SeriesVectorIndex:
+    """Índice compartido del proceso (registrado en `quantex.core.resources`)."""
+    from quantex.core.resources import registry
+    return registry.get('series_vector_index')
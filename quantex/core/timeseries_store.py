@@ -0,0 +1,234 @@
+# quantex/core/timeseries_store.py
+# Almacén local columnar (Arrow IPC, un archivo por serie) para leer `time_series_data` sin ir a Supabase.
+
+import os
+import sys
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import numpy as np
+except ImportError:
+    pa = None
+    print("[TIMESERIES_STORE] ⚠️ pyarrow no está instalado. Las lecturas irán siempre a Supabase.")
+
+# --- CONFIGURACIÓN ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(current_dir))
+STORE_DIR = os.path.join(PROJECT_ROOT, 'data', 'cache', 'timeseries')
+MANIFEST_NAME = '_manifest.json'
+SYNC_PAGE_SIZE = 1000  # Tamaño de página de PostgREST
+SYNC_LOOKBACK_DAYS = 5  # Días que se vuelven a descargar en cada sync por si hubo correcciones
+# Una serie sincronizada hace más de estas horas no se sirve localmente (se consulta Supabase).
+# Cubre los procesos que leen el almacén pero no corren el pipeline de precios (p. ej. el servidor).
+MAX_STALENESS_HOURS = float(os.environ.get("QUANTEX_TIMESERIES_MAX_STALENESS_HOURS", "3"))
+# ---------------------
+
+
+class TimeSeriesStore:
+    """
+    Un archivo Arrow por serie (`series_id=<id>-<versión>.arrow`), ordenado por timestamp y
+    leído con memory-map: filtrar por rango de fechas es un `searchsorted` + `slice` sin copias.
+    El manifiesto apunta al archivo vigente de cada serie y guarda su marca de agua
+    (timestamp máximo) para que `sync_from_supabase` solo descargue lo nuevo.
+    Cada escritura crea un archivo nuevo en vez de sobrescribir, porque en Windows no se
+    puede reemplazar un archivo que otro proceso tiene memory-mapped.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR, max_staleness_hours: float = MAX_STALENESS_HOURS):
+        self.store_dir = store_dir
+        self.max_staleness = timedelta(hours=max_staleness_hours)
+        self._lock = threading.Lock()
+        self._manifest_cache = (None, {})  # (mtime del manifiesto, contenido)
+        self._tables = {}  # nombre de archivo -> (tabla memory-mapped, vista numpy de timestamps)
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None
+
+    # --- LECTURA ---
+    def _manifest(self) -> dict:
+        """Manifiesto vigente; solo se vuelve a leer del disco cuando cambia su mtime."""
+        try:
+            mtime = os.path.getmtime(os.path.join(self.store_dir, MANIFEST_NAME))
+        except OSError:
+            return {}
+        if self._manifest_cache[0] != mtime:
+            self._manifest_cache = (mtime, self._read_manifest())
+        return self._manifest_cache[1]
+
+    def _load_table(self, series_id):
+        """Devuelve (tabla, timestamps en microsegundos) o (None, None) si la serie no está almacenada."""
+        entry = self._manifest().get(str(series_id))
+        if not entry: return None, None
+        file_name = entry['file']
+        cached = self._tables.get(file_name)
+        if cached: return cached
+        with self._lock:
+            table = pa_ipc.open_file(pa.memory_map(os.path.join(self.store_dir, file_name), 'r')).read_all()
+            # Vista int64 sin copia sobre el buffer memory-mapped de la columna de timestamps.
+            timestamps = table.column('timestamp')
+            micros = timestamps.chunk(0).view(pa.int64()).to_numpy() if timestamps.num_chunks else np.empty(0, dtype='int64')
+            self._tables = {name: value for name, value in self._tables.items() if not name.startswith(f"series_id={series_id}-")}
+            self._tables[file_name] = (table, micros)
+        return table, micros
+
+    def read_rows(self, series_id, start: datetime = None, end: datetime = None, limit: int = None, descending: bool = True) -> list[dict] | None:
+        """
+        Devuelve las filas `{'timestamp': iso, 'value': float}` de la serie en [start, end]
+        (más recientes primero por defecto), o None si la serie no está en el almacén, si su última
+        sincronización tiene más de `max_staleness`, o si el rango empieza después de la marca de
+        agua: esos datos pueden existir en Supabase y todavía no haberse sincronizado, así que se
+        consulta allá en vez de responder con datos viejos o "sin datos".
+        """
+        if not self.enabled: return None
+        if self._is_stale(series_id): return None
+        try:
+            table, micros = self._load_table(series_id)
+        except Exception as e:
+            print(f"[TIMESERIES_STORE] ⚠️ No se pudo leer la serie {series_id}: {e}")
+            return None
+        if table is None: return None
+        if start and (len(micros) == 0 or _to_micros(start) > int(micros[-1])): return None
+
+        lo = int(np.searchsorted(micros, _to_micros(start), side='left')) if start else 0
+        hi = int(np.searchsorted(micros, _to_micros(end), side='right')) if end else table.num_rows
+        if descending and limit: lo = max(lo, hi - limit)
+        elif limit: hi = min(hi, lo + limit)
+        window = table.slice(lo, max(0, hi - lo))
+
+        rows = [{'timestamp': ts.isoformat(), 'value': value} for ts, value in zip(window.column('timestamp').to_pylist(), window.column('value').to_pylist())]
+        return rows[::-1] if descending else rows
+
+    # --- ESCRITURA ---
+    def _read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.store_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest: dict):
+        path = os.path.join(self.store_dir, MANIFEST_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _is_stale(self, series_id) -> bool:
+        entry = self._manifest().get(str(series_id))
+        if not entry: return False # No está en el almacén: _load_table ya devuelve None
+        synced_at = entry.get('synced_at')
+        if not synced_at: return True # Manifiesto anterior a 'synced_at': se sirve de Supabase hasta el próximo sync
+        return datetime.now(timezone.utc) - datetime.fromisoformat(synced_at) > self.max_staleness
+
+    def _mark_synced(self, series_id):
+        """Un sync sin filas nuevas igual confirma que la serie local está al día."""
+        with self._lock:
+            manifest = self._read_manifest()
+            if str(series_id) not in manifest: return
+            manifest[str(series_id)]['synced_at'] = datetime.now(timezone.utc).isoformat()
+            self._write_manifest(manifest)
+
+    def watermark(self, series_id) -> datetime | None:
+        """Timestamp máximo almacenado localmente para la serie."""
+        entry = self._manifest().get(str(series_id))
+        return datetime.fromisoformat(entry['max_timestamp']) if entry and entry.get('max_timestamp') else None
+
+    def merge_rows(self, series_id, rows: list[dict]) -> int:
+        """
+        Fusiona filas `{'timestamp', 'value'}` en el archivo de la serie. Si un timestamp
+        ya existía, gana el valor nuevo. Devuelve el total de filas de la serie.
+        """
+        if not self.enabled: return 0
+        existing = {}
+        try:
+            table, _ = self._load_table(series_id)
+        except Exception:
+            table = None
+        if table is not None:
+            existing = dict(zip(table.column('timestamp').to_pylist(), table.column('value').to_pylist()))
+        for row in rows:
+            ts = row['timestamp']
+            if isinstance(ts, str): ts = datetime.fromisoformat(ts)
+            if ts.tzinfo is None: ts = ts.replace(tzinfo=timezone.utc)
+            existing[ts.astimezone(timezone.utc)] = None if row['value'] is None else float(row['value'])
+
+        ordered = sorted(existing.items())
+        new_table = pa.table({
+            'timestamp': pa.array([ts for ts, _ in ordered], type=pa.timestamp('us', tz='UTC')),
+            'value': pa.array([value for _, value in ordered], type=pa.float64()),
+        }).combine_chunks()
+
+        # El archivo nuevo se escribe completo antes de publicarlo en el manifiesto,
+        # así los lectores nunca ven una serie a medio escribir.
+        os.makedirs(self.store_dir, exist_ok=True)
+        file_name = f"series_id={series_id}-{time.time_ns()}.arrow"
+        with pa_ipc.new_file(os.path.join(self.store_dir, file_name), new_table.schema) as writer:
+            writer.write_table(new_table)
+        with self._lock:
+            manifest = self._read_manifest()
+            previous = manifest.get(str(series_id), {}).get('file')
+            manifest[str(series_id)] = {'file': file_name, 'max_timestamp': ordered[-1][0].isoformat() if ordered else None, 'rows': len(ordered),
+                                        'synced_at': datetime.now(timezone.utc).isoformat()}
+            self._write_manifest(manifest)
+        if previous:
+            try:
+                os.remove(os.path.join(self.store_dir, previous))
+            except OSError:
+                pass # Sigue abierto por algún lector (Windows); se puede borrar en la próxima limpieza
+        return len(ordered)
+
+    def sync_from_supabase(self, supabase_client, series_ids: list, lookback_days: int = SYNC_LOOKBACK_DAYS) -> dict:
+        """
+        Actualiza incrementalmente el almacén: por cada serie descarga solo las filas
+        posteriores a su marca de agua (menos `lookback_days` para absorber correcciones).
+        Devuelve {series_id: filas descargadas}.
+        """
+        if not self.enabled:
+            print("[TIMESERIES_STORE] ⚠️ Sincronización omitida: pyarrow no está disponible.")
+            return {}
+        fetched = {}
+        for series_id in series_ids:
+            since = self.watermark(series_id)
+            query_since = since - timedelta(days=lookback_days) if since else None
+            rows, page_start = [], 0
+            while True:
+                query = supabase_client.table('time_series_data').select('timestamp, value').eq('series_id', series_id)
+                if query_since: query = query.gte('timestamp', query_since.isoformat())
+                page = query.order('timestamp').range(page_start, page_start + SYNC_PAGE_SIZE - 1).execute()
+                rows.extend(page.data or [])
+                if not page.data or len(page.data) < SYNC_PAGE_SIZE: break
+                page_start += SYNC_PAGE_SIZE
+            if rows or since is None:
+                self.merge_rows(series_id, rows)
+            else:
+                self._mark_synced(series_id)
+            fetched[series_id] = len(rows)
+        print(f"[TIMESERIES_STORE] ✅ Sincronizadas {len(series_ids)} series ({sum(fetched.values())} filas descargadas).")
+        return fetched
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is None: value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000)
+
+
+# --- INSTANCIA COMPARTIDA DEL PROCESO ---
+_default_store = TimeSeriesStore()
+
+def get_timeseries_store() -> TimeSeriesStore:
+    return _default_store
+
+
+if __name__ == "__main__":
+    # Sincroniza todas las series definidas: python quantex/core/timeseries_store.py
+    sys.path.append(PROJECT_ROOT)
+    from quantex.core.resources import get_supabase
+    from quantex.core.series_catalog import SeriesCatalog
+    supabase = get_supabase()
+    series_ids = [definition['id'] for definition in SeriesCatalog(supabase).all().values()]
+    _default_store.sync_from_supabase(supabase, series_ids)
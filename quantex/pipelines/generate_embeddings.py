@@ -1,71 +1,127 @@
 # data_workers/generate_embeddings.py
+# Regeneración incremental de los embeddings de `series_definitions`: solo se re-codifican las
+# series cuyo texto (nombre + descripción + categoría) cambió o cuyo vector es de otro modelo.
+#
+# Columnas requeridas (una sola vez, en el SQL editor de Supabase):
+#   ALTER TABLE series_definitions ADD COLUMN IF NOT EXISTS embedding_hash text;
+#   ALTER TABLE series_definitions ADD COLUMN IF NOT EXISTS embedding_model text;
+#
+# Uso:  python quantex/pipelines/generate_embeddings.py [--batch-size 64] [--force]
 
 import os
+import sys
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
 
-def generate_and_store_embeddings():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from quantex.core.resources import get_supabase, get_embedding_model, EMBEDDING_MODEL_NAME
+from quantex.core.series_catalog import invalidate_series_catalog
+
+# --- CONFIGURACIÓN ---
+EMBEDDING_BATCH_SIZE = 64     # Series por pasada del modelo (y por tanda de escrituras)
+UPDATE_WORKERS = 8            # Escrituras concurrentes a Supabase
+SOURCE_COLUMNS = 'id, series_name, description, category, embedding_hash, embedding_model'
+# ---------------------
+
+
+def build_embedding_text(series: dict) -> str:
+    """Texto que se codifica: nombre, descripción y categoría (las partes vacías se omiten)."""
+    parts = (series.get('series_name'), series.get('description'), series.get('category'))
+    return '. '.join(part.strip() for part in parts if part and part.strip())
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def needs_embedding(series: dict, text_hash: str, model_name: str = EMBEDDING_MODEL_NAME) -> bool:
+    return series.get('embedding_hash') != text_hash or series.get('embedding_model') != model_name
+
+def _write_embeddings(supabase, updates: list[dict]) -> int:
+    """Actualiza solo id + embedding + hash + modelo de cada serie; el resto de la fila no viaja ni se toca."""
+    def update_one(update: dict) -> bool:
+        try:
+            fields = {key: value for key, value in update.items() if key != 'id'}
+            supabase.table('series_definitions').update(fields).eq('id', update['id']).execute()
+            return True
+        except Exception as e:
+            print(f"  -> ❌ No se pudo actualizar la serie {update['id']}: {e}")
+            return False
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as executor:
+        return sum(executor.map(update_one, updates))
+
+def generate_and_store_embeddings(batch_size: int = EMBEDDING_BATCH_SIZE, force: bool = False) -> dict:
     """
-    Lee las series de la base de datos, genera sus embeddings
-    y los guarda de vuelta en Supabase, preservando los datos existentes.
+    Lee las series, detecta cuáles tienen el embedding desactualizado (texto o modelo distintos
+    a los guardados), los genera en lotes y escribe de vuelta solo los campos del embedding.
     """
     print("--- Iniciando proceso de generación de embeddings ---")
-    
-    # --- Conexión y Carga de Modelos ---
+    stats = {'series': 0, 'stale': 0, 'updated': 0, 'failed': 0, 'model': EMBEDDING_MODEL_NAME}
+
+    # --- Conexión ---
     try:
         dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
         load_dotenv(dotenv_path=dotenv_path)
-        supabase_url = os.environ.get("SUPABASE_URL")
-        supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-        supabase: Client = create_client(supabase_url, supabase_key)
+        supabase = get_supabase()
         print("✅ Conexión a Supabase exitosa.")
-
-        # Cargamos un modelo de embeddings multilingüe y eficiente
-        print("Cargando modelo de embeddings (esto puede tardar un momento la primera vez)...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✅ Modelo de embeddings cargado.")
-
     except Exception as e:
         print(f"❌ Error durante la inicialización: {e}")
-        return
+        return dict(stats, error=str(e))
 
     # --- Procesamiento de Series ---
     try:
-        # 1. Obtenemos TODA la información de las series que aún no tienen un embedding
-        response = supabase.table('series_definitions').select('*').filter('embedding', 'is', 'null').execute()
-        
-        if not response.data:
-            print("\n✅ ¡Excelente! Todas las series ya tienen su embedding. No hay nada que hacer.")
-            return
-
-        series_to_process = response.data
-        print(f"\nSe encontraron {len(series_to_process)} series para procesar.")
-
-        # 2. Generamos los embeddings para cada series_name
-        names_to_embed = [series['series_name'] for series in series_to_process]
-        print("Generando vectores de embeddings...")
-        embeddings = model.encode(names_to_embed)
-        print(f"✅ Se generaron {len(embeddings)} vectores.")
-
-        # 3. Preparamos los datos para la actualización
-        updates = []
-        for i, series in enumerate(series_to_process):
-            # Tomamos TODOS los datos existentes de la serie
-            updated_series = series
-            # Y añadimos el nuevo embedding
-            updated_series['embedding'] = embeddings[i].tolist()
-            updates.append(updated_series)
-
-        # 4. Actualizamos la base de datos con los registros completos
-        print("Actualizando la base de datos con los nuevos embeddings...")
-        if updates:
-            supabase.table('series_definitions').upsert(updates).execute()
-        
-        print(f"\n✅ ¡Proceso completado! Se actualizaron {len(updates)} series.")
+        # 1. Leemos solo las columnas que definen el texto y la versión del embedding (no los vectores).
+        response = supabase.table('series_definitions').select(SOURCE_COLUMNS).execute()
+        all_series = response.data or []
+        stats['series'] = len(all_series)
+
+        pending = []
+        for series in all_series:
+            text = build_embedding_text(series)
+            text_hash = content_hash(text)
+            if text and (force or needs_embedding(series, text_hash)):
+                pending.append((series['id'], text, text_hash))
+        stats['stale'] = len(pending)
 
+        if not pending:
+            print(f"\n✅ ¡Excelente! Las {len(all_series)} series tienen su embedding al día. No hay nada que hacer.")
+            return stats
+        print(f"\nSe encontraron {len(pending)} de {len(all_series)} series con el embedding desactualizado.")
+
+        # 2. El modelo solo se carga si hay algo que codificar.
+        print("Cargando modelo de embeddings (esto puede tardar un momento la primera vez)...")
+        model = get_embedding_model()
+        print("✅ Modelo de embeddings cargado.")
+
+        # 3. Codificamos y escribimos por lotes: un fallo a mitad de camino no pierde lo ya escrito.
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            embeddings = model.encode([text for _, text, _ in batch], batch_size=batch_size)
+            updates = [{'id': series_id, 'embedding': embedding.tolist(), 'embedding_hash': text_hash, 'embedding_model': EMBEDDING_MODEL_NAME}
+                       for (series_id, _, text_hash), embedding in zip(batch, embeddings)]
+            written = _write_embeddings(supabase, updates)
+            stats['updated'] += written
+            stats['failed'] += len(updates) - written
+            print(f"  -> Lote {start // batch_size + 1}: {written}/{len(updates)} series actualizadas.")
+
+        if stats['failed']:
+            # Con 'error' el daemon marca la ejecución como fallida; las series pendientes se reintentan en la próxima.
+            stats['error'] = f"No se pudieron actualizar {stats['failed']} de {stats['stale']} series."
+            print(f"\n⚠️ Proceso terminado con errores: {stats['updated']} series actualizadas, {stats['failed']} fallidas.")
+        else:
+            print(f"\n✅ ¡Proceso completado! Se actualizaron {stats['updated']} series.")
     except Exception as e:
         print(f"❌ Ocurrió un error durante el procesamiento: {e}")
+        stats['error'] = str(e)
+
+    if stats['updated']:
+        # El catálogo (y con él el índice vectorial local) se recarga en todos los procesos.
+        invalidate_series_catalog()
+    return stats
 
 if __name__ == "__main__":
-    generate_and_store_embeddings()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Regenera los embeddings desactualizados de series_definitions.")
+    parser.add_argument('--batch-size', type=int, default=EMBEDDING_BATCH_SIZE, help="Series por pasada del modelo.")
+    parser.add_argument('--force', action='store_true', help="Re-codifica todas las series aunque estén al día.")
+    args = parser.parse_args()
+    generate_and_store_embeddings(batch_size=args.batch_size, force=args.force)
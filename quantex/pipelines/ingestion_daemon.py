@@ -0,0 +1,182 @@
+# pipelines/ingestion_daemon.py
+# Proceso de larga duración que ejecuta los pipelines de noticias, de precios y de embeddings en
+# intervalos independientes, reutilizando los clientes (Supabase, Anthropic, HTTP) ya inicializados.
+# Estado en http://127.0.0.1:<puerto>/status
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Las carpetas de los pipelines tienen espacios: se agregan al path para importar sus módulos tal cual.
+pipelines_dir = os.path.dirname(os.path.abspath(__file__))
+for folder in ('news ingestion', 'price ingestion'):
+    sys.path.append(os.path.join(pipelines_dir, folder))
+
+# --- CONFIGURACIÓN ---
+NEWS_INTERVAL_MINUTES = 30
+PRICE_INTERVAL_MINUTES = 60
+JITTER_FRACTION = 0.1         # Hasta +10% del intervalo, para no coincidir siempre con otros procesos
+NEWS_TIMEOUT_MINUTES = 20
+PRICE_TIMEOUT_MINUTES = 30
+EMBEDDING_INTERVAL_MINUTES = 360  # Solo re-codifica series cuyo texto o modelo cambió: casi siempre no hace nada
+EMBEDDING_TIMEOUT_MINUTES = 30
+STATUS_PORT = 8765
+# ---------------------
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ScheduledJob:
+    """
+    Un pipeline con su intervalo. Nunca se solapa consigo mismo: si la ejecución anterior
+    sigue en curso, la siguiente espera. Si supera `timeout_seconds` se marca como
+    'timeout' (Python no puede interrumpir el hilo, así que no se relanza hasta que termine).
+    `fn()` devuelve un dict con los conteos de la ejecución; si trae 'error' cuenta como fallo.
+    """
+
+    def __init__(self, name: str, fn, interval_seconds: float, timeout_seconds: float, jitter_fraction: float = JITTER_FRACTION):
+        self.name = name
+        self.fn = fn
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.jitter_fraction = jitter_fraction
+        self.next_run = time.monotonic()  # La primera ejecución es inmediata
+        self._thread = None
+        self._started_at = None
+        self._lock = threading.Lock()
+        self.status = {'state': 'idle', 'runs': 0, 'failures': 0, 'last_started': None, 'last_finished': None,
+                       'last_duration_seconds': None, 'last_result': None, 'last_error': None}
+
+    def _schedule_next(self):
+        jitter = random.uniform(0, self.interval_seconds * self.jitter_fraction)
+        self.next_run = time.monotonic() + self.interval_seconds + jitter
+
+    def _run(self):
+        result, error = None, None
+        try:
+            result = self.fn()
+            if isinstance(result, dict) and result.get('error'): error = result['error']
+        except Exception as e:
+            error = str(e)
+        duration = time.monotonic() - self._started_at
+        with self._lock:
+            timed_out = self.status['state'] == 'timeout'
+            self.status.update({'last_finished': _now_iso(), 'last_duration_seconds': round(duration, 1), 'last_result': result, 'last_error': error})
+            if error and not timed_out: self.status['failures'] += 1
+            self.status['state'] = 'error' if error else 'ok'
+        print(f"{'❌' if error else '✅'} [{self.name}] Ejecución terminada en {duration:.1f}s{f' con error: {error}' if error else ''}.")
+
+    def tick(self):
+        """Llamado periódicamente por el scheduler: lanza el job si corresponde y vigila su timeout."""
+        now = time.monotonic()
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                if self.status['state'] == 'running' and now - self._started_at > self.timeout_seconds:
+                    self.status['state'] = 'timeout'
+                    self.status['failures'] += 1
+                    print(f"⏱️ [{self.name}] Superó {self.timeout_seconds / 60:g} min; no se relanzará hasta que termine.")
+                return
+            if now < self.next_run: return
+            self._started_at = now
+            self.status.update({'state': 'running', 'last_started': _now_iso()})
+            self.status['runs'] += 1
+            self._schedule_next()
+            self._thread = threading.Thread(target=self._run, name=f"job-{self.name}", daemon=True)
+            self._thread.start()
+        print(f"🚀 [{self.name}] Ejecución #{self.status['runs']} iniciada.")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.status, interval_minutes=self.interval_seconds / 60,
+                        next_run_in_seconds=max(0, round(self.next_run - time.monotonic())))
+
+
+class IngestionDaemon:
+    def __init__(self, jobs: list[ScheduledJob], status_port: int = STATUS_PORT):
+        self.jobs = jobs
+        self.status_port = status_port
+        self.started_at = _now_iso()
+        self._stop_event = threading.Event()
+
+    def status(self) -> dict:
+        return {'started_at': self.started_at, 'jobs': {job.name: job.snapshot() for job in self.jobs}}
+
+    def _start_status_server(self):
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/status'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(daemon.status(), default=str, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass  # Sin una línea de log por cada consulta
+
+        server = ThreadingHTTPServer(('127.0.0.1', self.status_port), StatusHandler)
+        threading.Thread(target=server.serve_forever, name='status-server', daemon=True).start()
+        print(f"📡 Estado disponible en http://127.0.0.1:{self.status_port}/status")
+        return server
+
+    def run_forever(self):
+        server = self._start_status_server()
+        try:
+            while not self._stop_event.is_set():
+                for job in self.jobs: job.tick()
+                self._stop_event.wait(1)
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrupción recibida: el daemon se detiene (los jobs en curso se abandonan).")
+        finally:
+            server.shutdown()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def build_jobs(news: bool = True, prices: bool = True, embeddings: bool = True) -> list[ScheduledJob]:
+    """Importa los pipelines una sola vez: sus clientes quedan inicializados para todas las ejecuciones."""
+    jobs = []
+    if news:
+        import ingestor_main
+        jobs.append(ScheduledJob('news', ingestor_main.main, NEWS_INTERVAL_MINUTES * 60, NEWS_TIMEOUT_MINUTES * 60))
+    if prices:
+        from dotenv import load_dotenv
+        from supabase import create_client
+        from run_price_pipeline import run_full_pipeline
+        load_dotenv(os.path.join(pipelines_dir, '.env')) # Mismo .env que usan ambos pipelines
+        supabase = create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY"))
+
+        def run_prices() -> dict:
+            stats = {}
+            if not run_full_pipeline(supabase=supabase, stats=stats): stats['error'] = "El pipeline de precios falló (ver log)."
+            return stats
+
+        jobs.append(ScheduledJob('prices', run_prices, PRICE_INTERVAL_MINUTES * 60, PRICE_TIMEOUT_MINUTES * 60))
+    if embeddings:
+        sys.path.append(os.path.dirname(os.path.dirname(pipelines_dir)))
+        from quantex.pipelines.generate_embeddings import generate_and_store_embeddings
+        jobs.append(ScheduledJob('embeddings', generate_and_store_embeddings, EMBEDDING_INTERVAL_MINUTES * 60, EMBEDDING_TIMEOUT_MINUTES * 60))
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daemon de ingesta: noticias, precios y embeddings en intervalos independientes.")
+    parser.add_argument('--no-news', action='store_true', help="No programa el pipeline de noticias.")
+    parser.add_argument('--no-prices', action='store_true', help="No programa el pipeline de precios.")
+    parser.add_argument('--no-embeddings', action='store_true', help="No programa la regeneración incremental de embeddings.")
+    parser.add_argument('--port', type=int, default=STATUS_PORT, help="Puerto local del endpoint de estado.")
+    args = parser.parse_args()
+    IngestionDaemon(build_jobs(news=not args.no_news, prices=not args.no_prices, embeddings=not args.no_embeddings), status_port=args.port).run_forever()
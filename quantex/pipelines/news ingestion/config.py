@@ -29,4 +29,29 @@ SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 # También definimos la URL del RSS aquí para que sea fácil de cambiar en el futuro
 RSS_FEED_URL = "https://rss.metal.com/news/the_latest.xml"
 
+# Lista de feeds a consultar en cada ejecución (se descargan en paralelo con GET condicional)
+RSS_FEED_URLS = [
+    RSS_FEED_URL,
+]
+RSS_FETCH_WORKERS = 4
+RSS_TIMEOUT_SECONDS = 20
+RSS_STATE_PATH = os.path.abspath(os.path.join(current_dir, '..', '..', '..', 'data', 'cache', 'rss_feed_state.json'))
+
+# Concurrencia y límites de tasa de cada etapa del pipeline de artículos
+SCRAPE_WORKERS = 4
+SUMMARIZE_WORKERS = 3
+INSERT_WORKERS = 1
+FIRECRAWL_REQUESTS_PER_SECOND = 2
+CLAUDE_REQUESTS_PER_SECOND = 1
+STAGE_QUEUE_SIZE = 10  # Artículos en espera entre etapas antes de frenar a la etapa anterior
+
+# Caché en disco del contenido scrapeado (compartida entre ejecuciones y temas)
+SCRAPE_CACHE_PATH = os.path.abspath(os.path.join(current_dir, '..', '..', '..', 'data', 'cache', 'scrape_cache.sqlite'))
+SCRAPE_CACHE_MAX_AGE_DAYS = 30
+SCRAPE_CACHE_MAX_MB = 200
+
+# Escritura por lotes de los artículos (upsert sobre source_url + topic)
+ARTICLE_BATCH_SIZE = 25
+ARTICLE_FLUSH_SECONDS = 30  # Aunque el lote no se llene, se escribe al menos cada N segundos
+
 print("✅ Configuración de news_ingestion_service cargada.")
\ No newline at end of file
@@ -2,6 +2,8 @@
 
 from supabase import create_client, Client
 from datetime import datetime
+import time
+import threading
 import config
 
 # Inicializa el cliente de Supabase una sola vez
@@ -25,24 +27,88 @@ def get_active_topics() -> list[dict]:
         print(f"Error al obtener temas activos: {e}")
         return []
 
-def get_existing_links_for_topic(topic: str) -> set[str]:
-    """Obtiene los URLs de artículos que ya existen para un tema específico."""
-    try:
-        response = supabase.table('news_articles').select('source_url').eq('topic', topic).execute()
-        if response.data:
-            return {item['source_url'] for item in response.data}
-        return set()
-    except Exception as e:
-        print(f"Error al obtener enlaces para el tema {topic}: {e}")
-        return set()
+def get_existing_article_keys(candidate_urls: list[str], chunk_size: int = 100) -> set[tuple[str, str]]:
+    """
+    Pregunta a Supabase solo por las URLs candidatas del feed actual (todas los temas a la vez)
+    y devuelve los pares (source_url, topic) que ya existen. El costo crece con el tamaño
+    del feed, no con el del archivo histórico. Las URLs se consultan en bloques para no
+    exceder el largo máximo de la petición.
+    """
+    existing = set()
+    unique_urls = sorted(set(candidate_urls))
+    for i in range(0, len(unique_urls), chunk_size):
+        chunk = unique_urls[i:i + chunk_size]
+        response = supabase.table('news_articles').select('source_url, topic').in_('source_url', chunk).execute()
+        existing.update((item['source_url'], item['topic']) for item in response.data or [])
+    return existing
 
-def insert_article(article_data: dict):
-    """Inserta un nuevo artículo procesado en la tabla news_articles."""
-    try:
-        supabase.table('news_articles').insert(article_data).execute()
-        print(f"✅ Artículo '{article_data['title']}' insertado con tópico '{article_data['topic']}'.")
-    except Exception as e:
-        print(f"❌ Error al insertar artículo: {e}")
+class ArticleWriter:
+    """
+    Acumula artículos y los escribe en lotes con upsert sobre (source_url, topic), de modo
+    que reejecutar el ingestor (o correr dos a la vez) no genera duplicados. Vacía el buffer
+    al llegar a `batch_size`, cuando pasan `flush_interval` segundos y al llamar a `close()`.
+    Requiere el índice único news_articles(source_url, topic) (ver read.me).
+    """
+
+    def __init__(self, batch_size: int = config.ARTICLE_BATCH_SIZE, flush_interval: float = config.ARTICLE_FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'inserted': 0, 'duplicates': 0, 'failed': 0, 'batches': 0}
+        self._buffer = {}  # (source_url, topic) -> fila; también descarta repetidos dentro del lote
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name='article-writer-flush', daemon=True)
+        self._timer.start()
+
+    def add(self, article_data: dict):
+        with self._lock:
+            self._buffer[(article_data['source_url'], article_data['topic'])] = article_data
+            is_full = len(self._buffer) >= self.batch_size
+        if is_full: self.flush()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(1):
+            if time.monotonic() - self._last_flush >= self.flush_interval: self.flush()
+
+    def _upsert(self, rows: list[dict]) -> int:
+        # ignore_duplicates: las filas ya existentes no se tocan y la respuesta trae solo las insertadas.
+        response = supabase.table('news_articles').upsert(rows, on_conflict='source_url,topic', ignore_duplicates=True).execute()
+        return len(response.data or [])
+
+    def flush(self) -> dict:
+        """Escribe lo acumulado en una sola llamada; si el lote falla, reintenta fila por fila para aislar la culpable."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._buffer = list(self._buffer.values()), {}
+                self._last_flush = time.monotonic()
+            if not rows: return self.stats
+            outcome = {'inserted': 0, 'duplicates': 0, 'failed': 0}
+            try:
+                outcome['inserted'] = self._upsert(rows)
+                outcome['duplicates'] = len(rows) - outcome['inserted']
+            except Exception as e:
+                print(f"⚠️ Falló el lote de {len(rows)} artículo(s) ({e}). Reintentando fila por fila...")
+                for row in rows:
+                    try:
+                        inserted = self._upsert([row])
+                        outcome['inserted'] += inserted
+                        outcome['duplicates'] += 1 - inserted
+                    except Exception as row_error:
+                        outcome['failed'] += 1
+                        print(f"❌ Error al guardar '{row['title']}' ({row['topic']}): {row_error}")
+            with self._lock:
+                for key, count in outcome.items(): self.stats[key] += count
+                self.stats['batches'] += 1
+            print(f"✅ Lote de {len(rows)} artículo(s) guardado: {outcome['inserted']} nuevo(s), {outcome['duplicates']} ya existían, {outcome['failed']} con error.")
+            return self.stats
+
+    def close(self) -> dict:
+        """Detiene el vaciado periódico, escribe lo pendiente y devuelve las estadísticas totales."""
+        self._closed.set()
+        self._timer.join()
+        return self.flush()
 
 def update_topic_fetch_time(topic: str):
     """Actualiza la fecha de la última búsqueda para un tema."""
@@ -1,78 +1,126 @@
 # news_ingestion_service/ingestor_main.py (VERSIÓN ACTUALIZADA)
 
+import config
 import database_manager as db
 import processing_utils as proc
+from worker_pool import RateLimiter, Stage, StagedPipeline
+from scrape_cache import ScrapeCache, normalize_url
+from topic_matcher import TopicMatcher
 from datetime import datetime, timezone
 
-def main():
-    """Función principal que orquesta el pipeline de ingesta de noticias."""
+# --- ETAPAS DEL PIPELINE DE ARTÍCULOS ---
+# El scraping recibe una tarea por URL {'article': ..., 'topics': [...]} y la reparte en una
+# tarea por tema {'article', 'topic', 'content'}: solo el resumen depende del tema.
+
+scrape_cache = ScrapeCache(config.SCRAPE_CACHE_PATH, config.SCRAPE_CACHE_MAX_AGE_DAYS, config.SCRAPE_CACHE_MAX_MB * 1024 * 1024)
+firecrawl_limiter = RateLimiter(config.FIRECRAWL_REQUESTS_PER_SECOND)
+
+def rate_limited_scrape(url: str) -> str | None:
+    # El límite de tasa aplica solo a las llamadas reales a Firecrawl, no a los aciertos de caché.
+    firecrawl_limiter.acquire()
+    return proc.scrape_article_with_firecrawl(url)
+
+def scrape_job(job: dict) -> list[dict] | None:
+    content = scrape_cache.get_or_scrape(job['article']['link'], rate_limited_scrape)
+    if not content:
+        return None
+    return [{'article': job['article'], 'topic': topic, 'content': content} for topic in job['topics']]
+
+def summarize_job(job: dict) -> dict:
+    job['summary'] = proc.summarize_text_with_claude(job['content'], job['topic'])
+    return job
+
+def insert_job(job: dict, writer: db.ArticleWriter) -> dict:
+    article = job['article']
+    article_to_insert = {
+        'published_at': article['published'],
+        'source_url': article['link'],
+        'topic': job['topic'], # <-- Usamos SIEMPRE el nombre canónico
+        'title': article['title'],
+        'summary': job['summary']
+    }
+    writer.add(article_to_insert)
+    return job
+
+def build_article_pipeline(writer: db.ArticleWriter) -> StagedPipeline:
+    return StagedPipeline([
+        Stage('scrape', scrape_job, config.SCRAPE_WORKERS),
+        Stage('summarize', summarize_job, config.SUMMARIZE_WORKERS, RateLimiter(config.CLAUDE_REQUESTS_PER_SECOND)),
+        Stage('insert', lambda job: insert_job(job, writer), config.INSERT_WORKERS),
+    ], queue_size=config.STAGE_QUEUE_SIZE)
+
+def main() -> dict:
+    """
+    Función principal que orquesta el pipeline de ingesta de noticias.
+    Devuelve los conteos de la ejecución (artículos del feed, URLs procesadas, filas guardadas).
+    """
     print("🚀 Iniciando servicio de ingesta de noticias...")
+    stats = {'feed_articles': 0, 'urls_processed': 0}
     
     # 1. Obtener la lista de temas a procesar desde la DB (ahora viene con alias)
     topics_to_process = db.get_active_topics()
     if not topics_to_process:
         print("No hay temas activos para procesar. Finalizando.")
-        return
+        return stats
         
     print(f"Temas a procesar: {[t['topic_name'] for t in topics_to_process]}")
     
     # 2. Obtener todos los artículos del feed RSS
     rss_articles = proc.fetch_articles_from_rss()
     print(f"Se encontraron {len(rss_articles)} artículos en el feed.")
+    stats['feed_articles'] = len(rss_articles)
 
-    # 3. Procesar cada tema individualmente
-    for topic_data in topics_to_process:
-        # --- LÓGICA DE ALIAS ---
-        canonical_name = topic_data['topic_name'] # Ej: "Cobre"
-        aliases = topic_data.get('aliases') or [] # Ej: ["copper"]
+    # 3. Una sola consulta para saber qué (URL, tema) del feed ya están guardados
+    try:
+        existing_keys = db.get_existing_article_keys([art['link'] for art in rss_articles])
+    except Exception as e:
+        print(f"❌ Error al consultar los artículos existentes: {e}. Finalizando para no duplicar.")
+        stats['error'] = str(e)
+        return stats
+    print(f"Se encontraron {len(existing_keys)} combinaciones artículo/tema ya guardadas.")
 
-        print(f"\n--- Procesando Tema Estándar: {canonical_name.upper()} ---")
+    # 4. Asignar temas a cada artículo en una sola pasada (nombre canónico + alias, sin tildes)
+    matcher = TopicMatcher(topics_to_process)
+    jobs_by_url = {}
+    new_count_by_topic = {topic_data['topic_name']: 0 for topic_data in topics_to_process}
+    for article in rss_articles:
+        new_topics = [name for name in matcher.match(article['title']) if (article['link'], name) not in existing_keys]
+        if not new_topics: continue
+        # Un mismo artículo puede calzar con varios temas: se scrapea una sola vez.
+        job = jobs_by_url.setdefault(normalize_url(article['link']), {'article': article, 'topics': []})
+        for name in new_topics:
+            if name in job['topics']: continue
+            job['topics'].append(name) # <-- Siempre el nombre canónico
+            new_count_by_topic[name] += 1
 
-        # Combinamos el nombre principal y sus alias para la búsqueda.
-        # Convertimos todo a minúsculas para una comparación robusta.
-        search_terms = [canonical_name.lower()] + [alias.lower() for alias in aliases]
-        print(f"Buscando con los términos: {search_terms}")
-        # --- FIN LÓGICA DE ALIAS ---
-        
-        # Usamos el nombre canónico para consultar los links existentes
-        existing_links = db.get_existing_links_for_topic(canonical_name)
-        print(f"Se encontraron {len(existing_links)} artículos existentes para '{canonical_name}'.")
-        
-        # Filtra usando la nueva lista de términos de búsqueda
-        new_articles_for_topic = [
-            art for art in rss_articles
-            # Comprueba si alguno de los términos de búsqueda está en el título
-            if any(term in art['title'].lower() for term in search_terms) and art['link'] not in existing_links
-        ]
-        
-        if not new_articles_for_topic:
+    topics_with_new_articles = []
+    for canonical_name, new_count in new_count_by_topic.items():
+        if not new_count:
             print(f"No hay artículos nuevos para '{canonical_name}'.")
             db.update_topic_fetch_time(canonical_name) # Actualizamos la fecha aunque no haya nuevos
             continue
-            
-        print(f"Procesando {len(new_articles_for_topic)} artículo(s) nuevo(s) para '{canonical_name}':")
-        
-        for article in new_articles_for_topic:
-            content = proc.scrape_article_with_firecrawl(article['link'])
-            if not content:
-                continue
-            
-            summary = proc.summarize_text_with_claude(content, canonical_name)
-            
-            article_to_insert = {
-                'published_at': article['published'],
-                'source_url': article['link'],
-                'topic': canonical_name, # <-- Usamos SIEMPRE el nombre canónico
-                'title': article['title'],
-                'summary': summary
-            }
-            
-            db.insert_article(article_to_insert)
+        print(f"Se encolan {new_count} artículo(s) nuevo(s) para '{canonical_name}'.")
+        topics_with_new_articles.append(canonical_name)
+
+    # 5. Scraping, resumen e inserción en paralelo, con una cola acotada entre cada etapa
+    if jobs_by_url:
+        print(f"\n--- Procesando {len(jobs_by_url)} URL(s) en el pipeline concurrente ---")
+        writer = db.ArticleWriter()
+        try:
+            build_article_pipeline(writer).run(list(jobs_by_url.values()))
+        finally:
+            write_stats = writer.close() # Escribe lo que quede en el buffer, incluso tras un Ctrl+C
+        print(f"📦 Artículos guardados: {write_stats}")
+        stats['urls_processed'] = len(jobs_by_url)
+        stats.update(write_stats)
+    scrape_cache.evict()
 
-        # Actualizar la fecha de la última búsqueda para el tema
+    # 6. Actualizar la fecha de la última búsqueda de los temas procesados
+    for canonical_name in topics_with_new_articles:
         db.update_topic_fetch_time(canonical_name)
         
     print("\n✅ Proceso de ingesta finalizado.")
+    return stats
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,29 +1,28 @@
 # news_ingestion_service/processing_utils.py
 
+import os
+import sys
+import json
 import feedparser
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from anthropic import Anthropic
 import time
 import config # Importamos nuestro archivo de configuración
 
-# --- INICIALIZACIÓN DE CLIENTES ---
-try:
-    anthropic_client = Anthropic(api_key=config.ANTHROPIC_API_KEY)
-    print("✅ Cliente de Anthropic inicializado en processing_utils.")
-except Exception as e:
-    print(f"❌ Error al inicializar cliente de Anthropic: {e}")
-    anthropic_client = None
+# Añadimos la raíz del proyecto al path para usar el gateway de LLM compartido de quantex.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from quantex.core.llm_gateway import create_message
+
+# Sesión HTTP compartida: reutiliza conexiones entre feeds y ejecuciones del mismo proceso
+http_session = requests.Session()
 
 # --- FUNCIONES DE PROCESAMIENTO ---
 
-def fetch_articles_from_rss() -> list[dict]:
+def _parse_entries(feed) -> list[dict]:
     """
-    Obtiene y parsea artículos desde un feed RSS, formateando la fecha a AAAA-MM-DD.
+    Convierte las entradas de un feed ya parseado en artículos, formateando la fecha a AAAA-MM-DD.
     """
-    print(f"Obteniendo artículos desde {config.RSS_FEED_URL}...")
-    feed = feedparser.parse(config.RSS_FEED_URL)
-    
     articles = []
     for entry in feed.entries:
         # Lógica robusta para parsear la fecha y formatearla
@@ -48,6 +47,73 @@ def fetch_articles_from_rss() -> list[dict]:
         })
     return articles
 
+def _load_feed_state(path: str = config.RSS_STATE_PATH) -> dict:
+    """{feed_url: {'etag', 'last_modified', 'articles'}} de la última descarga exitosa."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_feed_state(state: dict, path: str = config.RSS_STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def fetch_feed(url: str, previous: dict | None) -> dict | None:
+    """
+    Descarga un feed con GET condicional (If-None-Match / If-Modified-Since). Si el
+    servidor responde 304 se reutilizan los artículos guardados de la descarga anterior,
+    así los que fallaron se reintentan igual que antes pero sin volver a bajar el feed.
+    Devuelve la nueva entrada de estado o None si hubo un error.
+    """
+    previous = previous or {}
+    headers = {}
+    if previous.get('etag'): headers['If-None-Match'] = previous['etag']
+    if previous.get('last_modified'): headers['If-Modified-Since'] = previous['last_modified']
+    try:
+        response = http_session.get(url, headers=headers, timeout=config.RSS_TIMEOUT_SECONDS)
+        if response.status_code == 304 and 'articles' in previous:
+            print(f"  -> [RSS] Sin cambios (304): {url}")
+            return previous
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"  -> ❌ Error al descargar el feed {url}: {e}")
+        return None
+
+    articles = _parse_entries(feedparser.parse(response.content))
+    print(f"  -> [RSS] {len(articles)} artículo(s) en {url}")
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'articles': articles,
+    }
+
+def fetch_articles_from_rss(feed_urls: list[str] = None) -> list[dict]:
+    """
+    Obtiene los artículos de todos los feeds configurados en paralelo y guarda los
+    validadores de cada uno para la próxima ejecución. Un artículo presente en varios
+    feeds se devuelve una sola vez.
+    """
+    feed_urls = feed_urls or config.RSS_FEED_URLS
+    print(f"Obteniendo artículos desde {len(feed_urls)} feed(s)...")
+    state = _load_feed_state()
+    with ThreadPoolExecutor(max_workers=max(1, min(config.RSS_FETCH_WORKERS, len(feed_urls)))) as executor:
+        results = dict(zip(feed_urls, executor.map(lambda url: fetch_feed(url, state.get(url)), feed_urls)))
+
+    articles, seen_links = [], set()
+    for url in feed_urls:
+        feed_state = results[url]
+        if feed_state is None: continue # Si falla, se conserva el estado anterior del feed
+        state[url] = feed_state
+        for article in feed_state['articles']:
+            if article['link'] in seen_links: continue
+            seen_links.add(article['link'])
+            articles.append(article)
+    _save_feed_state(state)
+    return articles
+
 def scrape_article_with_firecrawl(url: str) -> str | None:
     """Usa Firecrawl para extraer el contenido principal de un artículo como Markdown."""
     print(f"  -> [Firecrawl] Scrapeando URL: {url[:50]}...")
@@ -76,10 +142,7 @@ def scrape_article_with_firecrawl(url: str) -> str | None:
         return None
 
 def summarize_text_with_claude(text: str, topic: str) -> str:
-    """Genera un resumen conciso usando Claude 3 Haiku."""
-    if not anthropic_client:
-        return "Error: Cliente de Anthropic no inicializado."
-        
+    """Genera un resumen conciso usando Claude 3 Haiku (a través del gateway compartido)."""
     print("    -> [Claude] Generando resumen...")
     
     prompt = f"""
@@ -95,7 +158,8 @@ def summarize_text_with_claude(text: str, topic: str) -> str:
     """
     
     try:
-        message = anthropic_client.messages.create(
+        message = create_message(
+            'news_summarizer',
             model="claude-3-haiku-20240307",
             max_tokens=512,
             messages=[{"role": "user", "content": prompt}]
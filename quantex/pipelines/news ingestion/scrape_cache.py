@@ -0,0 +1,100 @@
+# news_ingestion_service/scrape_cache.py
+# Caché en disco (SQLite) del contenido scrapeado, indexada por URL normalizada.
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAM_PREFIXES = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+
+def normalize_url(url: str) -> str:
+    """Misma noticia, misma clave: esquema/host en minúsculas, sin fragmento ni parámetros de tracking."""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith(TRACKING_PARAM_PREFIXES))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+class ScrapeCache:
+    """
+    Guarda el Markdown de cada artículo scrapeado. Las entradas vencen a los
+    `max_age_days` y, si la caché supera `max_bytes`, se eliminan las más antiguas.
+    Además, `get_or_scrape` garantiza un único scraping por URL aunque varios
+    hilos la pidan a la vez.
+    """
+
+    def __init__(self, path: str, max_age_days: float = 30, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.max_age_seconds = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._in_flight = {}  # url_key -> threading.Event mientras alguien la está scrapeando
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS scrapes (url_key TEXT PRIMARY KEY, url TEXT, content TEXT, fetched_at REAL, size INTEGER)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scrapes_fetched_at ON scrapes (fetched_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT content, fetched_at FROM scrapes WHERE url_key = ?", (self._key(url),)).fetchone()
+        if row and time.time() - row[1] <= self.max_age_seconds:
+            return row[0]
+        return None
+
+    def put(self, url: str, content: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO scrapes (url_key, url, content, fetched_at, size) VALUES (?, ?, ?, ?, ?)",
+                               (self._key(url), url, content, time.time(), len(content.encode('utf-8'))))
+            self._conn.commit()
+
+    def get_or_scrape(self, url: str, scrape_fn) -> str | None:
+        """Devuelve el contenido cacheado o llama a `scrape_fn(url)` una sola vez por URL."""
+        key = self._key(url)
+        while True:
+            content = self.get(url)
+            if content is not None:
+                print(f"  -> [Caché] Contenido reutilizado para: {url[:50]}...")
+                return content
+            with self._lock:
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            pending.wait() # Otro hilo la está scrapeando: esperamos su resultado
+            if self.get(url) is None: return None # Su scraping falló; no lo repetimos en esta ejecución
+        try:
+            content = scrape_fn(url)
+            if content: self.put(url, content)
+            return content
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def evict(self) -> int:
+        """Elimina entradas vencidas y, si hace falta, las más antiguas hasta respetar `max_bytes`."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM scrapes WHERE fetched_at < ?", (time.time() - self.max_age_seconds,)).rowcount
+            total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM scrapes").fetchone()[0]
+            if total_bytes > self.max_bytes:
+                for url_key, size in self._conn.execute("SELECT url_key, size FROM scrapes ORDER BY fetched_at").fetchall():
+                    if total_bytes <= self.max_bytes: break
+                    self._conn.execute("DELETE FROM scrapes WHERE url_key = ?", (url_key,))
+                    total_bytes -= size
+                    removed += 1
+            self._conn.commit()
+        if removed: print(f"🧹 Caché de scraping: {removed} entrada(s) eliminada(s).")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,51 @@
+# news_ingestion_service/topic_matcher.py
+# Detecta en una sola pasada qué temas (nombre + alias) menciona un título.
+
+import re
+import unicodedata
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas y sin tildes: 'Níquel' y 'niquel' se comparan igual."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _boundary_pattern(terms) -> str:
+    # La búsqueda va dentro de un lookahead para encontrar también términos que se solapan
+    # ("copper" y "copper price" desde la misma posición, o uno dentro del otro).
+    alternation = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return rf'(?<!\w)(?=({alternation})(?!\w))'
+
+
+class TopicMatcher:
+    """
+    Se construye una vez por ejecución a partir de las filas de news_topics
+    ({'topic_name': ..., 'aliases': [...]}) y compila todos los términos en una sola
+    expresión regular con límites de palabra. `match(title)` devuelve todos los temas
+    del título en el orden de `topics`.
+    """
+
+    def __init__(self, topics: list[dict]):
+        self.topic_order = [topic['topic_name'] for topic in topics]
+        term_topics = {}
+        for topic in topics:
+            for term in [topic['topic_name']] + list(topic.get('aliases') or []):
+                folded = fold_text(term).strip()
+                if folded: term_topics.setdefault(folded, set()).add(topic['topic_name'])
+
+        # Si un término contiene a otro como palabra completa, aparecer el largo implica el corto.
+        self._term_topics = {}
+        for term, names in term_topics.items():
+            implied = set(names)
+            for other, other_names in term_topics.items():
+                if other != term and re.search(rf'(?<!\w){re.escape(other)}(?!\w)', term): implied |= other_names
+            self._term_topics[term] = implied
+        self._pattern = re.compile(_boundary_pattern(self._term_topics)) if self._term_topics else None
+
+    def match(self, text: str) -> list[str]:
+        if not self._pattern or not text: return []
+        found = set()
+        for term in self._pattern.findall(fold_text(text)):
+            found |= self._term_topics[term]
+        return [name for name in self.topic_order if name in found]
@@ -0,0 +1,128 @@
+# news_ingestion_service/worker_pool.py
+# Pipeline por etapas con hilos: cada etapa tiene su propia cola acotada (backpressure),
+# su límite de concurrencia y, opcionalmente, un limitador de tasa.
+
+import time
+import queue
+import threading
+
+_END = object()  # Marca de fin de flujo que recorre las etapas
+
+
+class RateLimiter:
+    """Token bucket simple: como máximo `rate_per_second` adquisiciones por segundo (ráfagas de hasta `burst`)."""
+
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        self.rate_per_second = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait_time)
+
+
+class Stage:
+    """
+    Una etapa del pipeline. `fn(item)` devuelve el item para la etapa siguiente,
+    una lista de items (se reparten por separado a la etapa siguiente) o None para
+    descartarlo (p. ej. un scraping sin contenido).
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, rate_limiter: RateLimiter = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.rate_limiter = rate_limiter
+        self.stats = {'processed': 0, 'dropped': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+
+class StagedPipeline:
+    """
+    Conecta las etapas con colas acotadas: si una etapa se atrasa, las anteriores se
+    bloquean al llenar su cola en vez de acumular trabajo sin límite. `stop()` (o un
+    Ctrl+C durante `run`) deja de alimentar items nuevos y termina los que ya están en curso.
+    """
+
+    def __init__(self, stages: list[Stage], queue_size: int = 10):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue | None, remaining: list, remaining_lock: threading.Lock):
+        while True:
+            item = inbox.get()
+            if item is _END: break
+            try:
+                if stage.rate_limiter: stage.rate_limiter.acquire()
+                result = stage.fn(item)
+            except Exception as e:
+                print(f"  -> ❌ [{stage.name}] Error procesando un elemento: {e}")
+                stage._count('errors')
+                continue
+            if result is None:
+                stage._count('dropped')
+                continue
+            stage._count('processed')
+            if outbox is not None:
+                for next_item in (result if isinstance(result, list) else [result]): outbox.put(next_item)
+        # El último worker de la etapa avisa a la siguiente que no vendrá más trabajo.
+        with remaining_lock:
+            remaining[0] -= 1
+            is_last = remaining[0] == 0
+        if is_last and outbox is not None:
+            next_stage = self.stages[self.stages.index(stage) + 1]
+            for _ in range(next_stage.workers): outbox.put(_END)
+
+    def run(self, items) -> dict:
+        """Procesa los items por todas las etapas y devuelve las estadísticas por etapa."""
+        started_at = time.monotonic()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+            remaining, remaining_lock = [stage.workers], threading.Lock()
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage, queues[index], outbox, remaining, remaining_lock), name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                if self._stop_event.is_set(): break
+                queues[0].put(item) # Bloquea si la primera etapa va atrasada (backpressure)
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrupción recibida: terminando los artículos en curso...")
+            self._stop_event.set()
+        finally:
+            for _ in range(self.stages[0].workers): queues[0].put(_END)
+
+        for thread in threads:
+            while thread.is_alive():
+                try:
+                    thread.join(timeout=0.5)
+                except KeyboardInterrupt:
+                    print("\n⚠️ Interrupción recibida: esperando a que terminen los artículos en curso...")
+                    self._stop_event.set()
+
+        stats = {stage.name: dict(stage.stats) for stage in self.stages}
+        print(f"✅ Pipeline finalizado en {time.monotonic() - started_at:.1f}s: {stats}")
+        return stats
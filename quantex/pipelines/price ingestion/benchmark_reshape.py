@@ -0,0 +1,79 @@
+# benchmark_reshape.py
+# Compara la Fase 3 de ingest_data (ancho -> largo) fila por fila vs. vectorizada,
+# sobre una hoja sintética con el mismo formato que la hoja puente (todo texto).
+#
+# Uso: python benchmark_reshape.py [--years 10] [--series 50]
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+
+from ingest_data import build_data_points
+
+
+def build_data_points_iterrows(df: pd.DataFrame, date_column_header: str, definitions_map: dict) -> list[dict]:
+    """Implementación anterior de la Fase 3 (iterrows + strptime + float por celda), solo como referencia."""
+    data_to_insert = []
+    for index, row in df.iterrows():
+        try:
+            timestamp_str = str(row[date_column_header])
+            if not timestamp_str: continue
+            timestamp_obj_naive = datetime.strptime(timestamp_str, '%Y/%m/%d')
+            timestamp_iso = pytz.utc.localize(timestamp_obj_naive).isoformat()
+        except (ValueError, TypeError):
+            continue
+
+        for header in definitions_map:
+            if header in row and str(row[header]).strip() != '':
+                try:
+                    value_str = str(row[header]).replace(',', '')
+                    if value_str:
+                        value = float(value_str)
+                        series_id_to_insert = definitions_map.get(header)
+                        if series_id_to_insert:
+                            data_to_insert.append({'series_id': series_id_to_insert, 'timestamp': timestamp_iso, 'value': value})
+                except (ValueError, TypeError):
+                    pass
+    return data_to_insert
+
+def make_synthetic_sheet(years: int, n_series: int, seed: int = 7) -> tuple[pd.DataFrame, dict]:
+    """Hoja con días hábiles, valores con separador de miles y ~5% de celdas vacías."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=datetime(2025, 6, 30), periods=years * 261)
+    data = {'Fecha': dates.strftime('%Y/%m/%d')}
+    for i in range(n_series):
+        values = np.round(rng.uniform(100, 20000, len(dates)), 2)
+        column = pd.Series(values).map('{:,.2f}'.format)
+        column[rng.random(len(dates)) < 0.05] = ''
+        data[f"Serie {i}"] = column.values
+    df = pd.DataFrame(data)
+    definitions_map = {f"Serie {i}": i + 1 for i in range(n_series)}
+    return df, definitions_map
+
+def run(years: int, n_series: int):
+    df, definitions_map = make_synthetic_sheet(years, n_series)
+    print(f"Hoja sintética: {len(df)} filas x {n_series} series ({len(df) * n_series:,} celdas)")
+
+    start = time.perf_counter()
+    legacy = build_data_points_iterrows(df, 'Fecha', definitions_map)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = build_data_points(df, 'Fecha', definitions_map)
+    vectorized_seconds = time.perf_counter() - start
+
+    key = lambda p: (p['series_id'], p['timestamp'])
+    same_output = sorted(legacy, key=key) == sorted(vectorized, key=key)
+    print(f"  iterrows:    {legacy_seconds:8.3f} s  ({len(legacy):,} puntos)")
+    print(f"  vectorizado: {vectorized_seconds:8.3f} s  ({len(vectorized):,} puntos)")
+    print(f"  aceleración: {legacy_seconds / vectorized_seconds:8.1f}x  | mismos puntos: {'✅' if same_output else '❌'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la Fase 3 de ingest_data.")
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--series', type=int, default=50)
+    args = parser.parse_args()
+    run(args.years, args.series)
@@ -0,0 +1,217 @@
+# bulk_writer.py
+# Escritor masivo para Supabase: lotes dimensionados por bytes, upserts en paralelo,
+# reintentos con backoff exponencial y archivo de "dead letters" para reenviar lo que falle.
+
+import os
+import json
+import glob
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- CONFIGURACIÓN ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+DEAD_LETTER_DIR = os.path.join(project_root, 'data', 'cache', 'dead_letter')
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TARGET_BATCH_BYTES = 1_000_000  # ~1 MB de JSON por petición
+DEFAULT_MAX_BATCH_ROWS = 10_000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_BACKOFF = 1.0  # Segundos; se duplica en cada reintento (con jitter)
+# Errores de Postgres/PostgREST transitorios (llegan como JSON, sin status HTTP): sí se reintentan.
+RETRYABLE_DB_CODES = {
+    '57014',                                           # statement timeout (además se divide el lote)
+    '53300', '53400',                                  # demasiadas conexiones / límite de configuración
+    '40001', '40P01',                                  # serialización / deadlock
+    '08000', '08003', '08006', '57P01', '57P03',       # conexión perdida, servidor reiniciando
+    'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003',    # PostgREST sin conexión al pool / timeout del pool
+}
+STATEMENT_TIMEOUT_CODE = '57014'
+# ---------------------
+
+
+def _status_code(error: Exception) -> int | None:
+    """
+    Código HTTP del error, si lo hay. El `code` de un APIError de postgrest es un SQLSTATE ('23505')
+    o un código 'PGRST...', no un HTTP; solo cuando la respuesta no era JSON postgrest guarda ahí el
+    status HTTP (como entero).
+    """
+    for candidate in (getattr(error, 'status_code', None), getattr(getattr(error, 'response', None), 'status_code', None)):
+        if isinstance(candidate, int): return candidate
+    code = getattr(error, 'code', None)
+    if _is_api_error(error) and isinstance(code, int): return code
+    return None
+
+def _is_api_error(error: Exception) -> bool:
+    return type(error).__name__ == 'APIError' and type(error).__module__.startswith('postgrest')
+
+def _is_network_error(error: Exception) -> bool:
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError): return True
+    except ImportError:
+        pass
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+def _db_code(error: Exception) -> str | None:
+    code = getattr(error, 'code', None)
+    return code if _is_api_error(error) and isinstance(code, str) else None
+
+def _is_retryable(error: Exception) -> bool:
+    # Red, 5xx, 408, 429 y los errores transitorios de la base (timeout, conexiones, deadlock).
+    # El resto de los errores de Postgres (clave duplicada, valor inválido, permisos...) o un 4xx
+    # va a fallar igual en cada reintento: se informa de inmediato.
+    status = _status_code(error)
+    if status is not None: return status >= 500 or status in (408, 429)
+    if _db_code(error) in RETRYABLE_DB_CODES: return True
+    if _is_api_error(error): return False
+    return _is_network_error(error)
+
+
+class BulkWriter:
+    """
+    Envía filas a una tabla de Supabase con un pool acotado de workers concurrentes.
+    Cada lote se arma por tamaño estimado en bytes, se reintenta con backoff exponencial
+    y, si agota los reintentos, se guarda en disco para reenviarlo con `replay_dead_letters`.
+    """
+
+    def __init__(self, supabase, table: str, on_conflict: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                 target_batch_bytes: int = DEFAULT_TARGET_BATCH_BYTES, max_batch_rows: int = DEFAULT_MAX_BATCH_ROWS,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_backoff: float = DEFAULT_BASE_BACKOFF, dead_letter_dir: str = DEAD_LETTER_DIR):
+        self.supabase = supabase
+        self.table = table
+        self.on_conflict = on_conflict
+        self.max_workers = max_workers
+        self.target_batch_bytes = target_batch_bytes
+        self.max_batch_rows = max_batch_rows
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.dead_letter_dir = dead_letter_dir
+        self.metrics = []  # Una entrada por lote: rows, bytes, latency_s, retries, ok
+        self._metrics_lock = threading.Lock()
+
+    def plan_batches(self, rows: list[dict]) -> list[list[dict]]:
+        """Divide las filas en lotes de ~target_batch_bytes según el tamaño JSON medio de una muestra."""
+        if not rows: return []
+        sample = rows[:: max(1, len(rows) // 200)][:200]
+        bytes_per_row = max(1, sum(len(json.dumps(row, default=str)) for row in sample) / len(sample))
+        rows_per_batch = int(max(1, min(self.max_batch_rows, self.target_batch_bytes // bytes_per_row)))
+        return [rows[i:i + rows_per_batch] for i in range(0, len(rows), rows_per_batch)]
+
+    def _send_batch(self, batch_number: int, batch: list[dict]) -> bool:
+        payload_bytes = len(json.dumps(batch, default=str))
+        started_at = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                self.supabase.table(self.table).upsert(batch, on_conflict=self.on_conflict).execute()
+                self._record(batch_number, len(batch), payload_bytes, time.perf_counter() - started_at, retries, True)
+                return True
+            except Exception as e:
+                if (_status_code(e) == 413 or _db_code(e) == STATEMENT_TIMEOUT_CODE) and len(batch) > 1:
+                    # Payload demasiado grande o upsert que excede el statement timeout: partimos el lote en dos.
+                    print(f"  -> ⚠️ Lote {batch_number} demasiado grande ({len(batch)} filas, {payload_bytes:,} bytes): {e}. Dividiéndolo...")
+                    half = len(batch) // 2
+                    return self._send_batch(batch_number, batch[:half]) & self._send_batch(batch_number, batch[half:])
+                if retries >= self.max_retries or not _is_retryable(e):
+                    print(f"  -> ❌ Lote {batch_number} falló tras {retries} reintento(s): {e}")
+                    if self.dead_letter_dir: self._write_dead_letter(batch_number, batch, str(e))
+                    self._record(batch_number, len(batch), payload_bytes, time.perf_counter() - started_at, retries, False)
+                    return False
+                wait_time = self.base_backoff * (2 ** retries) * random.uniform(0.5, 1.5)
+                retries += 1
+                print(f"  -> ⚠️ Lote {batch_number} falló ({e}). Reintento {retries}/{self.max_retries} en {wait_time:.1f}s...")
+                time.sleep(wait_time)
+
+    def _record(self, batch_number, rows, payload_bytes, latency, retries, ok):
+        metric = {'batch': batch_number, 'rows': rows, 'bytes': payload_bytes, 'latency_s': round(latency, 3), 'retries': retries, 'ok': ok}
+        with self._metrics_lock:
+            self.metrics.append(metric)
+        print(f"  -> {'✅' if ok else '❌'} Lote {batch_number}: {rows} filas, {payload_bytes:,} bytes, {latency:.2f}s, {retries} reintento(s).")
+
+    def _write_dead_letter(self, batch_number: int, batch: list[dict], error: str):
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        path = os.path.join(self.dead_letter_dir, f"{self.table}-{time.strftime('%Y%m%d-%H%M%S')}-{batch_number:05d}-{random.randint(0, 9999):04d}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'table': self.table, 'on_conflict': self.on_conflict, 'error': error, 'rows': batch}, f, default=str)
+        print(f"  -> 💾 Lote guardado para reenvío en: {path}")
+
+    def write(self, rows: list[dict]) -> dict:
+        """Envía todas las filas y devuelve un resumen con totales y lotes fallidos."""
+        self.metrics = []
+        batches = self.plan_batches(rows)
+        print(f"  -> {len(rows)} filas en {len(batches)} lote(s), {self.max_workers} worker(s) en paralelo.")
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-writer") as executor:
+            results = list(executor.map(self._send_batch, range(1, len(batches) + 1), batches))
+        summary = {
+            'batches': len(batches),
+            'failed_batches': results.count(False),
+            'rows_ok': sum(m['rows'] for m in self.metrics if m['ok']),
+            'rows_failed': sum(m['rows'] for m in self.metrics if not m['ok']),
+            'bytes': sum(m['bytes'] for m in self.metrics),
+            'retries': sum(m['retries'] for m in self.metrics),
+            'elapsed_s': round(time.perf_counter() - started_at, 2),
+        }
+        print(f"  -> Resumen: {summary}")
+        return summary
+
+
+def replay_dead_letters(supabase, dead_letter_dir: str = DEAD_LETTER_DIR) -> int:
+    """Reenvía los lotes guardados en disco; borra cada archivo que se envía con éxito."""
+    paths = sorted(glob.glob(os.path.join(dead_letter_dir, '*.json')))
+    replayed = 0
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            dead_letter = json.load(f)
+        # Sin carpeta de dead letters: si vuelve a fallar, el archivo original se conserva.
+        writer = BulkWriter(supabase, dead_letter['table'], dead_letter['on_conflict'], max_workers=1, dead_letter_dir=None)
+        summary = writer.write(dead_letter['rows'])
+        if summary['failed_batches'] == 0:
+            os.remove(path)
+            replayed += 1
+    print(f"✅ Se reenviaron {replayed} de {len(paths)} lote(s) pendientes.")
+    return replayed
+
+
+def self_check():
+    """Comprobaciones rápidas con errores de postgrest fabricados y un cliente falso (no toca Supabase)."""
+    from postgrest.exceptions import APIError
+    api_error = lambda code: APIError({'code': code, 'message': 'm', 'hint': None, 'details': None})
+
+    for code in ('57014', '53300', '40001', '40P01', 'PGRST000', 'PGRST003', 502, 429):
+        assert _is_retryable(api_error(code)), f"{code} debería reintentarse"
+    for code in ('23505', '21000', '42501', '22P02', 'PGRST204', 400, 413):
+        assert not _is_retryable(api_error(code)), f"{code} no debería reintentarse"
+
+    class _TimeoutOnLargeBatches:
+        """Falla con 57014 si el lote tiene más de 2 filas."""
+        def __init__(self): self.sizes = []
+        def table(self, name): return self
+        def upsert(self, rows, on_conflict=None): self.rows = rows; return self
+        def execute(self):
+            self.sizes.append(len(self.rows))
+            if len(self.rows) > 2: raise api_error('57014')
+
+    client = _TimeoutOnLargeBatches()
+    writer = BulkWriter(client, 't', 'id', max_workers=1, max_retries=0, dead_letter_dir=None)
+    assert writer._send_batch(1, [{'id': i} for i in range(8)]), "el lote con statement timeout debería dividirse y escribirse"
+    assert sum(size for size in client.sizes if size <= 2) == 8, client.sizes
+    print("✅ bulk_writer: comprobaciones OK.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Herramientas del escritor masivo.")
+    parser.add_argument('--replay', action='store_true', help="Reenvía los lotes guardados en la carpeta de dead letters.")
+    parser.add_argument('--self-check', action='store_true', help="Verifica la clasificación de errores y la división de lotes (sin red).")
+    args = parser.parse_args()
+    if args.self_check:
+        self_check()
+    elif args.replay:
+        from dotenv import load_dotenv
+        from supabase import create_client
+        load_dotenv(dotenv_path=os.path.join(project_root, '.env'))
+        replay_dead_letters(create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY")))
+    else:
+        parser.print_help()
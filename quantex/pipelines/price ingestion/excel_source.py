@@ -0,0 +1,72 @@
+# excel_source.py
+# Lectura directa del Excel de Bloomberg (desde Drive o un archivo local) sin pasar por Google Sheets.
+
+import io
+from datetime import datetime, date
+import pandas as pd
+from openpyxl import load_workbook
+from googleapiclient.http import MediaIoBaseDownload
+
+from excel_to_sheets import SOURCE_EXCEL_NAME, SOURCE_TAB_NAME, get_google_services, find_file_by_name
+
+DATE_FORMAT = '%Y/%m/%d'  # Mismo formato que entregaba la hoja puente
+
+
+def download_excel_from_drive(file_name: str = SOURCE_EXCEL_NAME) -> io.BytesIO | None:
+    """Descarga el .xlsx una sola vez a memoria mediante la API de Drive."""
+    drive_service, _, _ = get_google_services()
+    if not drive_service: return None
+
+    excel_files = find_file_by_name(drive_service, file_name)
+    if not excel_files:
+        print(f"❌ ERROR CRÍTICO: No se encontró el archivo '{file_name}'.")
+        return None
+
+    print(f"Descargando '{file_name}' desde Google Drive...")
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, drive_service.files().get_media(fileId=excel_files[0]['id']))
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+    buffer.seek(0)
+    print(f"✅ Se descargaron {buffer.getbuffer().nbytes:,} bytes.")
+    return buffer
+
+def _format_date_cell(value):
+    if isinstance(value, (datetime, date)): return value.strftime(DATE_FORMAT)
+    return '' if value is None else str(value)
+
+def read_supabase_tab(source, tab_name: str = SOURCE_TAB_NAME) -> pd.DataFrame:
+    """
+    Lee solo la pestaña `tab_name` en modo streaming (read_only) y devuelve el mismo
+    DataFrame que producía la hoja puente: primera columna con fechas 'AAAA/MM/DD'
+    y una columna por serie. `source` puede ser una ruta o un buffer en memoria.
+    """
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if tab_name not in workbook.sheetnames:
+            raise ValueError(f"No se encontró una pestaña con el nombre '{tab_name}'.")
+        rows = workbook[tab_name].iter_rows(values_only=True)
+        headers = ['' if h is None else str(h).strip() for h in next(rows, ())]
+        width = len(headers)
+        data_rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows if any(cell is not None for cell in row)]
+    finally:
+        workbook.close()
+    if not data_rows: raise ValueError("La pestaña no tiene suficientes filas para procesar.")
+
+    df = pd.DataFrame(data_rows, columns=headers)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+    df = df.loc[:, df.columns != '']
+    df[df.columns[0]] = df[df.columns[0]].map(_format_date_cell)
+    print(f"✅ Se leyeron {len(df)} filas y {len(df.columns)} columnas de la pestaña '{tab_name}'.")
+    return df
+
+def load_bloomberg_dataframe(local_path: str = None) -> pd.DataFrame | None:
+    """Punto de entrada del modo directo: archivo local si se indica, si no descarga desde Drive."""
+    try:
+        source = local_path or download_excel_from_drive()
+        if source is None: return None
+        return read_supabase_tab(source)
+    except Exception as e:
+        print(f"❌ Ocurrió un error al leer el Excel: {e}")
+        return None
@@ -1,20 +1,29 @@
 # ingest_data.py (Versión final con manejo de NaN y exclusión de fecha)
 
 import os
+import sys
+import argparse
 import gspread
 import pandas as pd
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from datetime import datetime
-import pytz
 import math # Importamos math para chequear por NaN
 
+# Añadimos la raíz del proyecto al path para importar los módulos compartidos de quantex.
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.append(project_root)
+from quantex.core.series_catalog import invalidate_series_catalog
+from quantex.core.timeseries_store import get_timeseries_store
+from bulk_writer import BulkWriter
+from ingestion_state import DEFAULT_LOOKBACK_DAYS, DEFINITIONS_STATE_PATH, file_hash, load_state, save_state, bootstrap_series_state, select_delta_points, build_state
+
+METADATA_MAPPING_PATH = os.path.join(os.path.dirname(__file__), 'metadata_mapping.csv')
+
 def load_metadata_mapping():
     """Carga el mapa de metadata desde el archivo CSV, manejando valores vacíos."""
     try:
-        mapping_path = os.path.join(os.path.dirname(__file__), 'metadata_mapping.csv')
         # CAMBIO: na_filter=False le dice a pandas que lea las celdas vacías como strings vacíos ('') en lugar de NaN.
-        df_map = pd.read_csv(mapping_path, na_filter=False)
+        df_map = pd.read_csv(METADATA_MAPPING_PATH, na_filter=False)
         mapping_dict = df_map.set_index('sheet_header').to_dict('index')
         print(f"✅ Mapa de metadata cargado con {len(mapping_dict)} definiciones.")
         return mapping_dict
@@ -22,7 +31,78 @@ def load_metadata_mapping():
         print(f"❌ ERROR al cargar el mapa de metadata: {e}")
         return None
 
-def main():
+def ensure_series_definitions(supabase: Client, metadata_map: dict) -> dict:
+    """
+    Asegura todas las definiciones de metadata_mapping.csv con un único upsert masivo y
+    devuelve {sheet_header: series_id}. Si el CSV no cambió desde la última ejecución
+    exitosa, reutiliza el mapa guardado sin tocar Supabase.
+    """
+    mapping_hash = file_hash(METADATA_MAPPING_PATH)
+    saved = load_state(DEFINITIONS_STATE_PATH)
+    if saved.get('csv_hash') == mapping_hash and set(saved.get('ids', {})) == set(metadata_map):
+        print("ℹ️ metadata_mapping.csv no cambió: se reutilizan los IDs de la última ejecución.")
+        return saved['ids']
+
+    # Nos aseguramos de que no haya valores NaN antes de enviar a Supabase
+    payloads = [{k: (v if not pd.isna(v) else None) for k, v in series_info.items() if k != 'sheet_header'} for series_info in metadata_map.values()]
+    response = supabase.table('series_definitions').upsert(payloads, on_conflict='series_name').execute()
+    ids_by_name = {row['series_name']: row['id'] for row in (response.data or []) if 'id' in row}
+    missing_names = [payload['series_name'] for payload in payloads if payload['series_name'] not in ids_by_name]
+    if missing_names:
+        # El upsert no devolvió la representación completa: una sola consulta `in_()` como respaldo.
+        select_res = supabase.table('series_definitions').select('id, series_name').in_('series_name', missing_names).execute()
+        ids_by_name.update({row['series_name']: row['id'] for row in select_res.data or []})
+
+    ids_by_header = {}
+    for header, series_info in metadata_map.items():
+        if series_info['series_name'] not in ids_by_name: raise ValueError(f"La serie '{series_info['series_name']}' no aparece en series_definitions tras el upsert.")
+        ids_by_header[header] = ids_by_name[series_info['series_name']]
+
+    # Las definiciones cambiaron: avisamos al catálogo compartido (y a otros procesos).
+    invalidate_series_catalog()
+    save_state({'csv_hash': mapping_hash, 'ids': ids_by_header}, DEFINITIONS_STATE_PATH)
+    return ids_by_header
+
+def build_data_points(df: pd.DataFrame, date_column_header: str, definitions_map: dict) -> list[dict]:
+    """
+    Convierte la hoja ancha (una columna por serie) en la lista de puntos
+    {'series_id', 'timestamp', 'value'} para `time_series_data`, sin iterar fila por fila:
+    fechas con `pd.to_datetime`, `melt` a formato largo y valores con `pd.to_numeric`.
+    Las fechas o valores que no se pueden interpretar se descartan.
+    """
+    headers = [h for h in definitions_map if h in df.columns]
+    if not headers: return []
+
+    timestamps = pd.to_datetime(df[date_column_header].astype(str).str.strip(), format='%Y/%m/%d', errors='coerce')
+    wide = df[headers].copy()
+    wide['timestamp'] = timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S+00:00') # Medianoche UTC, igual que antes
+    wide = wide[timestamps.notna()]
+
+    long_df = wide.melt(id_vars='timestamp', var_name='header', value_name='value')
+    raw_values = long_df['value']
+    if not pd.api.types.is_numeric_dtype(raw_values):
+        # Celdas de texto: quitamos separadores de miles y espacios antes de convertir.
+        raw_values = raw_values.astype(str).str.replace(',', '', regex=False).str.strip()
+    long_df['value'] = pd.to_numeric(raw_values, errors='coerce')
+    long_df['series_id'] = long_df['header'].map(definitions_map)
+    long_df = long_df.dropna(subset=['value', 'series_id'])
+    # Una fecha repetida en la hoja haría fallar el upsert del lote: nos quedamos con la última.
+    long_df = long_df.drop_duplicates(subset=['series_id', 'timestamp'], keep='last')
+
+    return [{'series_id': series_id, 'timestamp': timestamp, 'value': value}
+            for series_id, timestamp, value in zip(long_df['series_id'].tolist(), long_df['timestamp'].tolist(), long_df['value'].tolist())]
+
+def main(full_reload: bool = False, lookback_days: int = DEFAULT_LOOKBACK_DAYS, source_df: pd.DataFrame = None,
+         supabase: Client = None, stats: dict = None):
+    """
+    Ingesta la hoja puente en Supabase. Por defecto es incremental: solo envía los puntos
+    posteriores a la marca de agua de cada serie o cuyo valor cambió dentro de los últimos
+    `lookback_days`. Con `full_reload=True` reenvía la historia completa.
+    Si se entrega `source_df` (modo directo desde el Excel), no se lee la hoja puente.
+    Un proceso de larga duración puede pasar su propio cliente `supabase` ya inicializado
+    y un dict `stats`, que se completa con los conteos de la ejecución.
+    """
+    stats = stats if stats is not None else {}
     dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
     load_dotenv(dotenv_path=dotenv_path)
     print("✅ Variables de entorno cargadas.")
@@ -32,28 +112,35 @@ def main():
 
     try:
         # ... (código de inicialización de clientes sin cambios)
-        supabase_url = os.environ.get("SUPABASE_URL")
-        supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
-        supabase: Client = create_client(supabase_url, supabase_key)
-        print("✅ Cliente de Supabase inicializado.")
-        credentials_path = os.environ.get("GOOGLE_CREDENTIALS_PATH")
-        gc = gspread.service_account(filename=credentials_path)
-        spreadsheet = gc.open("Datos para Supabase Google Sheet")
-        worksheet = spreadsheet.sheet1
-        print("✅ Conexión a google_sheets exitosa.")
+        if supabase is None:
+            supabase_url = os.environ.get("SUPABASE_URL")
+            supabase_key = os.environ.get("SUPABASE_SERVICE_KEY")
+            supabase = create_client(supabase_url, supabase_key)
+            print("✅ Cliente de Supabase inicializado.")
+        if source_df is None:
+            credentials_path = os.environ.get("GOOGLE_CREDENTIALS_PATH")
+            gc = gspread.service_account(filename=credentials_path)
+            spreadsheet = gc.open("Datos para Supabase Google Sheet")
+            worksheet = spreadsheet.sheet1
+            print("✅ Conexión a google_sheets exitosa.")
     except Exception as e:
         print(f"❌ Error durante la inicialización de servicios: {e}")
         return False
     
-    print("\n--- Fase 1: Leyendo datos de la hoja puente ---")
-    try:
-        all_values = worksheet.get_all_values()
-        if len(all_values) < 2: raise ValueError("La hoja puente está vacía.")
-        df = pd.DataFrame(all_values[1:], columns=all_values[0])
-        print(f"✅ Se leyeron {len(df)} filas.")
-    except Exception as e:
-        print(f"❌ Error leyendo la hoja: {e}")
-        return False
+    if source_df is not None:
+        print("\n--- Fase 1: Usando los datos leídos directamente del Excel ---")
+        df = source_df
+        print(f"✅ Se recibieron {len(df)} filas.")
+    else:
+        print("\n--- Fase 1: Leyendo datos de la hoja puente ---")
+        try:
+            all_values = worksheet.get_all_values()
+            if len(all_values) < 2: raise ValueError("La hoja puente está vacía.")
+            df = pd.DataFrame(all_values[1:], columns=all_values[0])
+            print(f"✅ Se leyeron {len(df)} filas.")
+        except Exception as e:
+            print(f"❌ Error leyendo la hoja: {e}")
+            return False
 
     print("\n--- Fase 2: Asegurando definiciones en Supabase ---")
     definitions_map = {} 
@@ -61,66 +148,71 @@ def main():
         # CAMBIO: Nos aseguramos de no procesar la columna de fecha como una serie
         date_column_header = df.columns[0]
         headers_in_map = [h for h in df.columns if h in metadata_map and h != date_column_header]
-        
-        for header in headers_in_map:
-            series_info = metadata_map[header]
-            # Nos aseguramos de que no haya valores NaN antes de enviar a Supabase
-            definition_payload = {k: (v if not pd.isna(v) else None) for k, v in series_info.items() if k != 'sheet_header'}
-            supabase.table('series_definitions').upsert(definition_payload, on_conflict='series_name').execute()
-            
-            series_id_res = supabase.table('series_definitions').select('id').eq('series_name', series_info['series_name']).single().execute()
-            definitions_map[header] = series_id_res.data['id']
+        ids_by_header = ensure_series_definitions(supabase, metadata_map)
+        definitions_map = {header: ids_by_header[header] for header in headers_in_map}
         print(f"✅ Definiciones para {len(definitions_map)} series aseguradas y mapa de IDs creado.")
     except Exception as e:
         print(f"❌ Error procesando definiciones: {e}")
         return False
 
     print("\n--- Fase 3: Preparando lote de datos para Supabase ---")
-    data_to_insert = []
-    headers_to_process = headers_in_map # Usamos la misma lista de encabezados válidos
-
-    for index, row in df.iterrows():
-        try:
-            timestamp_str = str(row[date_column_header])
-            if not timestamp_str: continue
-            timestamp_obj_naive = datetime.strptime(timestamp_str, '%Y/%m/%d')
-            timestamp_iso = pytz.utc.localize(timestamp_obj_naive).isoformat()
-        except (ValueError, TypeError):
-            continue
-
-        for header in headers_to_process:
-            if header in row and str(row[header]).strip() != '':
-                try:
-                    value_str = str(row[header]).replace(',', '')
-                    if value_str:
-                        value = float(value_str)
-                        series_id_to_insert = definitions_map.get(header)
-                        if series_id_to_insert:
-                            data_to_insert.append({'series_id': series_id_to_insert, 'timestamp': timestamp_iso, 'value': value})
-                except (ValueError, TypeError):
-                    pass
+    data_to_insert = build_data_points(df, date_column_header, definitions_map)
     
     print(f"✅ Se prepararon {len(data_to_insert)} puntos de datos para la ingesta.")
+    stats['points_prepared'] = len(data_to_insert)
 
-    print(f"\n--- Fase 4: Insertando datos en 'time_series_data' ---")
-    if data_to_insert:
-        batch_size = 5000
-        for i in range(0, len(data_to_insert), batch_size):
-            batch = data_to_insert[i:i + batch_size]
-            print(f"  -> Enviando lote de {len(batch)} registros...")
+    ingestion_state = load_state()
+    if full_reload:
+        print("ℹ️ Modo completo (--full): se enviará la historia completa.")
+        points_to_send = data_to_insert
+    else:
+        for series_id in set(definitions_map.values()):
+            if str(series_id) in ingestion_state: continue
             try:
-                supabase.table('time_series_data').upsert(batch, on_conflict="series_id, timestamp").execute()
+                series_state = bootstrap_series_state(supabase, series_id, lookback_days)
+                if series_state: ingestion_state[str(series_id)] = series_state
             except Exception as e:
-                print(f"❌ Error al insertar lote: {e}")
-                return False
+                print(f"  -> ⚠️ No se pudo leer la marca de agua de la serie {series_id}; se enviará completa: {e}")
+        points_to_send = select_delta_points(data_to_insert, ingestion_state, lookback_days)
+        print(f"✅ Modo incremental: {len(points_to_send)} de {len(data_to_insert)} puntos son nuevos o cambiaron.")
+
+    print(f"\n--- Fase 4: Insertando datos en 'time_series_data' ---")
+    stats['points_sent'] = len(points_to_send)
+    if points_to_send:
+        writer = BulkWriter(supabase, 'time_series_data', on_conflict="series_id, timestamp")
+        write_summary = writer.write(points_to_send)
+        stats['rows_failed'] = write_summary['rows_failed']
+        if write_summary['failed_batches']:
+            # Los lotes exitosos ya quedaron escritos; los fallidos están en disco para reenviarse
+            # con `python bulk_writer.py --replay`. No guardamos el estado: la próxima ejecución los reintenta.
+            print(f"❌ {write_summary['failed_batches']} lote(s) no se pudieron insertar ({write_summary['rows_failed']} filas).")
+            return False
         print(f"\n✅ ¡PROCESO DE INGESTA COMPLETADO!")
     else:
         print("ℹ️ No se encontraron nuevos datos para insertar.")
+
+    # Solo tras una ingesta exitosa: Supabase ya coincide con la hoja para estas series.
+    ingestion_state.update(build_state(data_to_insert, lookback_days))
+    try:
+        save_state(ingestion_state)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el estado de la ingesta (la próxima ejecución lo reconstruirá): {e}")
+
+    print(f"\n--- Fase 5: Actualizando el almacén local de series ---")
+    try:
+        # Solo baja lo posterior a la marca de agua de cada serie; un fallo aquí no invalida la ingesta.
+        get_timeseries_store().sync_from_supabase(supabase, sorted(set(definitions_map.values())))
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el almacén local (las lecturas usarán Supabase): {e}")
     
     return True
 
 if __name__ == "__main__":
-    if main():
+    parser = argparse.ArgumentParser(description="Ingesta la hoja puente de precios en Supabase.")
+    parser.add_argument('--full', action='store_true', help="Reenvía la historia completa en lugar de solo los cambios.")
+    parser.add_argument('--lookback-days', type=int, default=DEFAULT_LOOKBACK_DAYS, help="Ventana (días) en la que se detectan valores corregidos.")
+    args = parser.parse_args()
+    if main(full_reload=args.full, lookback_days=args.lookback_days):
         print("\nEjecución de ingesta completada con éxito.")
     else:
         print("\nEjecución de ingesta falló.")   
\ No newline at end of file
@@ -0,0 +1,86 @@
+# ingestion_state.py
+# Estado local de la ingesta de precios: marca de agua por serie + hashes de la ventana reciente.
+# Permite que ingest_data envíe a Supabase solo los puntos nuevos o corregidos.
+
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+
+# --- CONFIGURACIÓN ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+STATE_PATH = os.path.join(project_root, 'data', 'cache', 'price_ingestion_state.json')
+DEFINITIONS_STATE_PATH = os.path.join(project_root, 'data', 'cache', 'price_definitions_state.json')
+DEFAULT_LOOKBACK_DAYS = 10  # Días antes de la marca de agua en los que se detectan correcciones
+# ---------------------
+
+
+def value_hash(value) -> str:
+    """Hash corto y estable del valor de un punto."""
+    return hashlib.sha1(repr(float(value)).encode('utf-8')).hexdigest()[:16]
+
+def file_hash(path: str) -> str:
+    """Hash del contenido de un archivo (para detectar cambios en metadata_mapping.csv)."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _lookback_cutoff(watermark: str, lookback_days: int) -> str:
+    return (datetime.fromisoformat(watermark) - timedelta(days=lookback_days)).isoformat()
+
+def load_state(path: str = STATE_PATH) -> dict:
+    """Devuelve {series_id (str): {'watermark': iso, 'hashes': {iso: hash}}}; vacío si no hay estado."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def bootstrap_series_state(supabase, series_id, lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> dict | None:
+    """
+    Reconstruye el estado de una serie desde Supabase (primera ejecución o estado borrado):
+    su timestamp máximo y los valores de la ventana de revisión. None si la serie no tiene datos.
+    """
+    latest = supabase.table('time_series_data').select('timestamp').eq('series_id', series_id).order('timestamp', desc=True).limit(1).execute()
+    if not latest.data: return None
+    watermark = datetime.fromisoformat(latest.data[0]['timestamp']).isoformat()
+    window = supabase.table('time_series_data').select('timestamp, value').eq('series_id', series_id).gte('timestamp', _lookback_cutoff(watermark, lookback_days)).execute()
+    hashes = {datetime.fromisoformat(row['timestamp']).isoformat(): value_hash(row['value']) for row in window.data or [] if row['value'] is not None}
+    return {'watermark': watermark, 'hashes': hashes}
+
+def select_delta_points(data_points: list[dict], state: dict, lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> list[dict]:
+    """
+    Filtra los puntos que hay que enviar: los posteriores a la marca de agua de su serie
+    y, dentro de la ventana de revisión, los que no existen o cuyo valor cambió.
+    Las series sin estado se envían completas.
+    """
+    delta = []
+    for point in data_points:
+        series_state = state.get(str(point['series_id']))
+        if not series_state:
+            delta.append(point)
+            continue
+        timestamp = point['timestamp']
+        if timestamp > series_state['watermark']:
+            delta.append(point)
+        elif timestamp >= _lookback_cutoff(series_state['watermark'], lookback_days):
+            if series_state['hashes'].get(timestamp) != value_hash(point['value']):
+                delta.append(point)
+    return delta
+
+def build_state(data_points: list[dict], lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> dict:
+    """Estado que queda tras una ingesta exitosa: Supabase ya coincide con estos puntos."""
+    by_series = {}
+    for point in data_points:
+        by_series.setdefault(str(point['series_id']), []).append(point)
+    state = {}
+    for series_id, points in by_series.items():
+        watermark = max(point['timestamp'] for point in points)
+        cutoff = _lookback_cutoff(watermark, lookback_days)
+        state[series_id] = {'watermark': watermark, 'hashes': {p['timestamp']: value_hash(p['value']) for p in points if p['timestamp'] >= cutoff}}
+    return state
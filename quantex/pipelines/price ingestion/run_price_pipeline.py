@@ -1,34 +1,50 @@
 # Ingestors/run_pipeline.py (Versión Robusta con Manejo de Errores)
 from excel_to_sheets import main as run_file_conversion
+from excel_source import load_bloomberg_dataframe
 from ingest_data import main as run_supabase_ingestion
 import time
+import argparse
 
-def run_full_pipeline():
+def run_full_pipeline(full_reload: bool = False, via_sheets: bool = False, excel_path: str = None, supabase=None, stats: dict = None) -> bool:
     print("====== INICIANDO PIPELINE DE DATOS COMPLETO ======")
     print("=" * 50)
 
-    print("\n>>> [ETAPA 1/2] Ejecutando conversión de Excel a Google Sheet...")
-    success_stage_1 = run_file_conversion()
-    
+    source_df = None
+    if via_sheets:
+        print("\n>>> [ETAPA 1/2] Ejecutando conversión de Excel a Google Sheet...")
+        success_stage_1 = run_file_conversion()
+    else:
+        # Modo directo: el Excel se lee una vez y pasa en memoria a la ingesta, sin hoja puente.
+        print("\n>>> [ETAPA 1/2] Leyendo el Excel de Bloomberg directamente...")
+        source_df = load_bloomberg_dataframe(excel_path)
+        success_stage_1 = source_df is not None
+
     if not success_stage_1:
         print("\n❌ ERROR FATAL en la Etapa 1. Pipeline detenido.")
         print("=" * 50)
-        return
+        return False
 
-    print(">>> [ETAPA 1/2] Conversión finalizada con éxito.")
-    print("\nEsperando 5 segundos para la propagación de datos en Google...")
-    time.sleep(5)
+    print(">>> [ETAPA 1/2] Etapa finalizada con éxito.")
+    if via_sheets:
+        print("\nEsperando 5 segundos para la propagación de datos en Google...")
+        time.sleep(5)
 
     print("\n>>> [ETAPA 2/2] Ejecutando ingesta de datos a Supabase...")
-    success_stage_2 = run_supabase_ingestion()
+    success_stage_2 = run_supabase_ingestion(full_reload=full_reload, source_df=source_df, supabase=supabase, stats=stats)
 
     if not success_stage_2:
         print("\n❌ ERROR FATAL en la Etapa 2. Pipeline detenido.")
         print("=" * 50)
-        return
+        return False
 
     print("\n" + "=" * 50)
     print("✅✅✅====== PIPELINE FINALIZADO CON ÉXITO REAL Y TOTAL ======")
+    return True
 
 if __name__ == "__main__":
-    run_full_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline de precios: Excel de Bloomberg -> Supabase.")
+    parser.add_argument('--full', action='store_true', help="Reenvía la historia completa en lugar de solo los cambios.")
+    parser.add_argument('--via-sheets', action='store_true', help="Usa el flujo anterior: conversión a Google Sheet + hoja puente.")
+    parser.add_argument('--excel', metavar='RUTA', help="Lee un .xlsx local en lugar de descargarlo desde Drive.")
+    args = parser.parse_args()
+    run_full_pipeline(full_reload=args.full, via_sheets=args.via_sheets, excel_path=args.excel)